@@ -0,0 +1,13 @@
+import json
+
+
+def read_json(request):
+    """
+    Lê o corpo JSON de uma requisição das views async. Retorna None se for inválido.
+    """
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,149 @@
+import math
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+BENCH_PASSWORD = 'senha-do-benchmark'
+
+
+def make_cpf(number):
+    """
+    CPF formatado e válido a partir de um número (até 9 dígitos).
+    """
+
+    digits = [int(d) for d in f'{number:09d}']
+    for weight in (10, 11):
+        dv = sum(d * (weight - i) for i, d in enumerate(digits)) * 10 % 11
+        digits.append(dv if dv < 10 else 0)
+
+    cpf = ''.join(map(str, digits))
+    return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+
+def seed_users(count, offset=1, balance=Decimal('1000000.00'), batch_size=5000):
+    """
+    Cria `count` usuários verificados com bulk_create, todos com a senha
+    BENCH_PASSWORD (hash calculado uma única vez). Retorna os ids criados.
+    """
+
+    from users.models import CustomUser
+
+    password = make_password(BENCH_PASSWORD)
+    users = [
+        CustomUser(
+            cpf=make_cpf(offset + n),
+            username=f'bench{offset + n:09d}',
+            email=f'bench{offset + n}@bench.local',
+            password=password,
+            balance=balance,
+            is_verified_email=True,
+        )
+        for n in range(count)
+    ]
+    CustomUser.objects.bulk_create(users, batch_size=batch_size)
+    return [user.pk for user in users]
+
+
+def seed_transactions(user_ids, count, batch_size=5000, seed=0):
+    """
+    Cria `count` transferências concluídas entre pares aleatórios de `user_ids`,
+    com os lançamentos do razão correspondentes, em lotes de bulk_create.
+    """
+
+    from transaction.models import LedgerEntry, Transaction
+
+    rng = random.Random(seed)
+    created = 0
+    while created < count:
+        transactions, entries = [], []
+        for _ in range(min(batch_size, count - created)):
+            sender_id, receiver_id = rng.sample(user_ids, 2)
+            amount = Decimal(rng.randint(1, 10000)) / 100
+            transaction = Transaction(
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                amount=amount,
+                status=Transaction.StatusChoices.COMPLETED,
+            )
+            transactions.append(transaction)
+            entries.append(LedgerEntry(user_id=sender_id, transaction=transaction, amount=-amount))
+            entries.append(LedgerEntry(user_id=receiver_id, transaction=transaction, amount=amount))
+
+        Transaction.objects.bulk_create(transactions)
+        LedgerEntry.objects.bulk_create(entries)
+        created += len(transactions)
+
+    return created
+
+
+def percentile(values, p):
+    """
+    Percentil pelo método do posto mais próximo; `values` já ordenado.
+    """
+
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(latencies, elapsed):
+    """
+    Resumo de uma rodada: latências em ms (p50/p99/média/máx) e requisições/s.
+    """
+
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3),
+        'throughput_rps': round(len(values) / elapsed, 2),
+    }
+
+
+def timed(call, iterations):
+    """
+    Executa `call(n)` `iterations` vezes e retorna (latências, tempo total).
+    """
+
+    latencies = []
+    started = time.perf_counter()
+    for n in range(iterations):
+        begin = time.perf_counter()
+        call(n)
+        latencies.append(time.perf_counter() - begin)
+    return latencies, time.perf_counter() - started
+
+
+@contextmanager
+def benchmark_databases(tmp_dir):
+    """
+    Cria bancos de teste descartáveis (nunca toca os dados reais) e os remove no fim.
+    No SQLite o banco vai para um arquivo em `tmp_dir`, para que as threads do
+    teste concorrente usem conexões próprias sobre o mesmo banco.
+    """
+
+    for alias in connections:
+        settings_dict = connections[alias].settings_dict
+        if settings_dict['ENGINE'] == 'django.db.backends.sqlite3' and not settings_dict['TEST'].get('NAME'):
+            settings_dict['TEST']['NAME'] = f'{tmp_dir}/bench_{alias}.sqlite3'
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
@@ -0,0 +1,12 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared_cache(alias='default'):
+    """
+    True se o cache é visto por todos os processos (Redis, Memcached, banco, arquivo).
+    LocMem é de cada processo: o que um worker ou comando grava ali não chega aos outros.
+    """
+
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from api_uruita.caching import is_shared_cache
+from api_uruita.db_routers import REPLICA
+
+
+@register()
+def replica_requires_shared_cache(app_configs, **kwargs):
+    if REPLICA in settings.DATABASES and not is_shared_cache():
+        return [Warning(
+            "DATABASE_REPLICA_URL configurada sem cache compartilhado: as leituras ficam no primário.",
+            hint="Defina CACHE_URL (ex.: redis://) para a aderência ao primário valer entre workers.",
+            id='api_uruita.W001',
+        )]
+    return []
+
+
+@register()
+def deferred_settlement_requires_shared_cache(app_configs, **kwargs):
+    if settings.TRANSACTION_SETTLEMENT_MODE == 'deferred' and not is_shared_cache():
+        return [Error(
+            "TRANSACTION_SETTLEMENT_MODE='deferred' exige cache compartilhado: o settle_transactions "
+            "roda em outro processo e as invalidações dele não chegariam aos workers web.",
+            hint="Defina CACHE_URL (ex.: redis://).",
+            id='api_uruita.E001',
+        )]
+    return []
@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from api_uruita.caching import is_shared_cache
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+_read_db = ContextVar('read_db', default=PRIMARY)
+
+
+def _sticky_key(user_id):
+    return f"db:sticky:{user_id}"
+
+
+def _replica_enabled():
+    # A aderência fica no cache: sem cache compartilhado, a próxima requisição
+    # pode cair em outro worker que não a vê, então a réplica não é usada.
+    return REPLICA in settings.DATABASES and is_shared_cache()
+
+
+def mark_recent_write(*user_ids):
+    """
+    Mantém as leituras desses usuários no primário por REPLICA_STICKY_SECONDS,
+    para que vejam a própria escrita mesmo com atraso de replicação.
+    """
+
+    if _replica_enabled():
+        cache.set_many({_sticky_key(user_id): True for user_id in user_ids}, settings.REPLICA_STICKY_SECONDS)
+
+
+def read_db_for(user_id):
+    """
+    Banco de leitura para o usuário: a réplica, salvo se ela não existir, se não
+    houver cache compartilhado ou se o usuário escreveu há pouco.
+    """
+
+    if not _replica_enabled() or cache.get(_sticky_key(user_id)):
+        return PRIMARY
+    return REPLICA
+
+
+async def aread_db_for(user_id):
+    """
+    Versão assíncrona de read_db_for.
+    """
+
+    if not _replica_enabled() or await cache.aget(_sticky_key(user_id)):
+        return PRIMARY
+    return REPLICA
+
+
+@contextmanager
+def reading_from(alias):
+    """
+    Direciona as leituras do bloco para `alias`. O ContextVar acompanha
+    também as chamadas do ORM assíncrono (sync_to_async copia o contexto).
+    """
+
+    token = _read_db.set(alias)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Escritas vão sempre para o primário. Leituras também, a não ser que o
+    código tenha optado pela réplica (ver ReplicaReadMixin / reading_from).
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_db.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaReadMixin:
+    """
+    Mixin para views DRF somente leitura: depois da autenticação, requisições
+    GET/HEAD/OPTIONS passam a ler da réplica (respeitando a aderência ao primário).
+    """
+
+    read_db = PRIMARY
+    _read_db_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if request.method in SAFE_METHODS and request.user.is_authenticated:
+            self.read_db = read_db_for(request.user.pk)
+            self._read_db_token = _read_db.set(self.read_db)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._read_db_token is not None:
+            _read_db.reset(self._read_db_token)
+            self._read_db_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
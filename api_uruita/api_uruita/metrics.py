@@ -0,0 +1,177 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ("Latência total da requisição.", LATENCY_BUCKETS),
+    'http_request_db_seconds': ("Tempo gasto em queries SQL por requisição.", LATENCY_BUCKETS),
+    'http_request_serializer_seconds': ("Tempo gasto em serializers por requisição.", LATENCY_BUCKETS),
+    'http_request_queries': ("Quantidade de queries SQL por requisição.", QUERY_BUCKETS),
+}
+
+
+class RequestMetrics:
+    """
+    Contadores da requisição corrente, acumulados pelo wrapper de queries e pelos serializers.
+    """
+
+    __slots__ = ('queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+current = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """
+    Histograma cumulativo em memória (formato Prometheus), seguro entre threads.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum
+
+
+_series = {}
+_series_lock = threading.Lock()
+
+# Contadores expostos por outros módulos: nome -> (ajuda, função que retorna {rótulos: valor}).
+_counters = {}
+
+
+def register_counter(name, help_text, collect):
+    _counters[name] = (help_text, collect)
+
+
+def observe(name, labels, value):
+    key = (name, labels)
+    histogram = _series.get(key)
+    if histogram is None:
+        with _series_lock:
+            histogram = _series.setdefault(key, Histogram(HISTOGRAMS[name][1]))
+    histogram.observe(value)
+
+
+def record_request(view, method, duration, metrics):
+    labels = (('view', view), ('method', method))
+    observe('http_request_duration_seconds', labels, duration)
+    observe('http_request_db_seconds', labels, metrics.db_time)
+    observe('http_request_serializer_seconds', labels, metrics.serializer_time)
+    observe('http_request_queries', labels, metrics.queries)
+
+
+def reset():
+    with _series_lock:
+        _series.clear()
+
+
+def _format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+def render_prometheus():
+    """
+    Exporta todos os histogramas no formato texto do Prometheus (0.0.4).
+    """
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (series, labels), histogram in sorted(_series.items()):
+            if series != name:
+                continue
+            counts, total = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    for name, (help_text, collect) in _counters.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in collect().items():
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Wrapper de execução instalado em toda conexão: soma queries e tempo de banco
+    na requisição corrente (e não faz nada fora de uma requisição medida).
+    """
+
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """
+    Mede validação (is_valid) e renderização (data) do serializer na requisição corrente.
+    Para many=True, use TimedListSerializer como Meta.list_serializer_class.
+    """
+
+    def is_valid(self, *args, **kwargs):
+        with serializer_timer():
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
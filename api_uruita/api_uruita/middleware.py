@@ -0,0 +1,107 @@
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from api_uruita import metrics
+
+logger = logging.getLogger('api_uruita.profiling')
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match._func_path
+
+
+class MetricsMiddleware:
+    """
+    Registra por view: latência total, quantidade de queries, tempo de banco
+    e tempo de serializer, em histogramas em memória (ver api_uruita.metrics).
+
+    Com METRICS_PROFILE_EVERY = N > 0, uma a cada N requisições síncronas roda
+    sob cProfile e as funções mais caras vão para o log 'api_uruita.profiling'
+    (e para METRICS_PROFILE_DIR, se configurado). Com 0, o profiler nem é tocado.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(metrics.install_query_recorder, dispatch_uid='metrics_query_recorder')
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_recorder(sender=None, connection=connection)
+        self.profile_every = settings.METRICS_PROFILE_EVERY
+        self.requests = itertools.count(1)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if self.profile_every and next(self.requests) % self.profile_every == 0:
+            return self._profiled(request)
+
+        state = metrics.RequestMetrics()
+        token = metrics.current.set(state)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+            metrics.record_request(_view_name(request), request.method, time.perf_counter() - started, state)
+
+    async def __acall__(self, request):
+        state = metrics.RequestMetrics()
+        token = metrics.current.set(state)
+        started = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+            metrics.record_request(_view_name(request), request.method, time.perf_counter() - started, state)
+
+    def _profiled(self, request):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outra thread já está perfilando (Python 3.12+ só permite um profiler).
+            profiler = None
+
+        state = metrics.RequestMetrics()
+        token = metrics.current.set(state)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            metrics.current.reset(token)
+            view = _view_name(request)
+            metrics.record_request(view, request.method, duration, state)
+            if profiler is not None:
+                profiler.disable()
+                self._dump(profiler, view, request.method, duration)
+
+    def _dump(self, profiler, view, method, duration):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output).sort_stats(pstats.SortKey.CUMULATIVE)
+        stats.print_stats(settings.METRICS_PROFILE_TOP)
+        logger.info("Perfil de %s %s (%.1f ms):\n%s", method, view, duration * 1000, output.getvalue())
+
+        if settings.METRICS_PROFILE_DIR:
+            os.makedirs(settings.METRICS_PROFILE_DIR, exist_ok=True)
+            stats.dump_stats(os.path.join(settings.METRICS_PROFILE_DIR, f'{view}-{time.time_ns()}.prof'))
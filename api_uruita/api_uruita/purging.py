@@ -0,0 +1,14 @@
+def delete_in_batches(queryset, batch_size=1000):
+    """
+    Apaga as linhas de `queryset` em lotes de `batch_size` (busca os ids e apaga
+    por pk), para não segurar travas na tabela inteira. Retorna o total apagado,
+    incluindo as linhas removidas em cascata.
+    """
+
+    manager = queryset.model._base_manager
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += manager.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from api_uruita.lru import LRUCache
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    '5/min' -> (capacidade 5, reposição de 5 fichas por minuto, em fichas/s).
+    """
+
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def _take(state, now, capacity, refill):
+    """
+    Balde de fichas: repõe o que o tempo decorrido permite e tenta gastar uma.
+    Retorna (novo estado, segundos até a próxima ficha ou None se liberou).
+    """
+
+    tokens, updated_at = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated_at) * refill)
+    if tokens >= 1:
+        return (tokens - 1, now), None
+    return (tokens, now), (1 - tokens) / refill
+
+
+class LocalBucketStore:
+    """
+    Baldes em memória do processo: custo de um lock e um dict por requisição.
+    Cada worker tem seus próprios baldes (o limite efetivo multiplica pelo
+    número de processos); use CacheBucketStore para um limite global.
+    """
+
+    def __init__(self):
+        self._buckets = LRUCache(maxsize=settings.RATELIMIT_LOCAL_SIZE)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill):
+        now = time.monotonic()
+        with self._lock:
+            state, wait = _take(self._buckets.get(key), now, capacity, refill)
+            # Depois de capacity / refill segundos o balde está cheio de novo: pode sumir.
+            self._buckets.set(key, state, ttl=capacity / refill)
+        return wait
+
+    async def aconsume(self, key, capacity, refill):
+        return self.consume(key, capacity, refill)
+
+
+class CacheBucketStore:
+    """
+    Baldes no cache compartilhado (RATELIMIT_CACHE_ALIAS), valendo para todos os
+    processos. A leitura e a escrita não são atômicas: sob rajadas concorrentes
+    o limite é aproximado, o que basta para conter abuso.
+    """
+
+    def __init__(self):
+        self._cache = caches[settings.RATELIMIT_CACHE_ALIAS]
+
+    def consume(self, key, capacity, refill):
+        state, wait = _take(self._cache.get(key), time.time(), capacity, refill)
+        self._cache.set(key, state, capacity / refill)
+        return wait
+
+    async def aconsume(self, key, capacity, refill):
+        state, wait = _take(await self._cache.aget(key), time.time(), capacity, refill)
+        await self._cache.aset(key, state, capacity / refill)
+        return wait
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.RATELIMIT_STORE)()
+    return _store
+
+
+def _bucket(scope, kind, value):
+    rate = settings.RATELIMIT_RATES.get(f'{scope}.{kind}')
+    if rate is None or not value:
+        return None
+    return (f'ratelimit:{scope}:{kind}:{value}', *parse_rate(rate))
+
+
+def hit(scope, kind, value):
+    """
+    Gasta uma ficha do balde (escopo, tipo de chave, valor). Retorna None se a
+    requisição pode seguir, ou os segundos de espera (Retry-After) se estourou.
+    Escopos/tipos sem taxa em RATELIMIT_RATES não são limitados.
+    """
+
+    bucket = _bucket(scope, kind, value)
+    return None if bucket is None else get_store().consume(*bucket)
+
+
+async def ahit(scope, kind, value):
+    bucket = _bucket(scope, kind, value)
+    return None if bucket is None else await get_store().aconsume(*bucket)
@@ -0,0 +1,26 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+# Chaves não-str: erros de validação de ListField vêm indexados por int.
+# Datetimes passam pelo encoder do DRF, que escreve UTC como "Z" (o orjson escreveria "+00:00").
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renderer JSON com orjson: mesma saída compacta em UTF-8 do JSONRenderer
+    padrão, com o custo de serialização em C. Tipos que o orjson não conhece
+    (Decimal, datetime, strings lazy, etc.) passam pelo encoder do DRF.
+    """
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_encoder.default, option=_OPTIONS)
@@ -17,9 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from api_uruita.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/user/', include('users.urls')),
     path('api/v1/transaction/', include('transaction.urls')),
+    path('api/v1/extrato/', include('extrato.urls')),
+    path('api/v1/metrics/', MetricsView.as_view(), name='metrics'),
+    # Views async nativas (ORM assíncrono), para deploy ASGI.
+    path('api/v1/async/user/', include('users.async_urls')),
+    path('api/v1/async/transaction/', include('transaction.async_urls')),
 
 ]
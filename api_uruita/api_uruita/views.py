@@ -0,0 +1,17 @@
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from api_uruita.metrics import render_prometheus
+
+
+class MetricsView(APIView):
+    """
+    Histogramas de latência, queries, banco e serializers por view, no formato
+    texto do Prometheus. Restrito a administradores.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
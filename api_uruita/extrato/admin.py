@@ -1,3 +1,6 @@
 from django.contrib import admin
 
+from extrato.models import StatementAggregate
+
 # Register your models here.
+admin.site.register(StatementAggregate)
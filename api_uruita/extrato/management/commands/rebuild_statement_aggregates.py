@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from extrato.services import rebuild_aggregates
+
+
+class Command(BaseCommand):
+    help = "Reconstrói os agregados diários/mensais do extrato a partir do histórico de transações."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--users-per-batch', type=int, default=500,
+            help="Usuários reconstruídos (e travados) por transação.",
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_aggregates(
+            batch_size=options['batch_size'], users_per_batch=options['users_per_batch'],
+        )
+        self.stdout.write(f"{created} agregado(s) gravado(s).")
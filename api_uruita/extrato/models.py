@@ -1,3 +1,38 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+from users.models import CustomUser
+
+
+class StatementAggregate(models.Model):
+    """
+    Totais de entrada/saída e saldo de fechamento de um usuário em um período (dia ou mês).
+    Mantido incrementalmente a cada transação concluída.
+
+    Para usuários com credit_shards > 1, os créditos caem em uma de K linhas
+    (`shard`) escolhida ao acaso; o total do período é a soma das linhas.
+    """
+
+    class PeriodChoices(models.TextChoices):
+        DAY = "DAY", _("Diário")
+        MONTH = "MONTH", _("Mensal")
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="statement_aggregates")
+    period = models.CharField(max_length=5, choices=PeriodChoices.choices)
+    period_start = models.DateField()
+    total_in = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_out = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    closing_balance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    transaction_count = models.PositiveIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    shard = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "period", "period_start", "shard"], name="unique_statement_aggregate_period"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} | {self.period} {self.period_start} #{self.shard}"
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+from api_uruita.metrics import TimedListSerializer, TimedSerializerMixin
+
+from .models import StatementAggregate
+
+
+class StatementAggregateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer para o resumo do extrato por período.
+    """
+
+    class Meta:
+        model = StatementAggregate
+        list_serializer_class = TimedListSerializer
+        fields = ['period', 'period_start', 'total_in', 'total_out', 'closing_balance', 'transaction_count']
+        read_only_fields = fields
@@ -0,0 +1,222 @@
+import heapq
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from extrato.models import StatementAggregate
+from transaction.models import Transaction
+from users.models import CustomUser
+
+STATEMENT_FIELDS = ('id', 'timestamp', 'sender_id', 'receiver_id', 'amount', 'comment', 'sender_balance_after', 'receiver_balance_after')
+STATEMENT_COLUMNS = ['id', 'timestamp', 'tipo', 'contraparte', 'valor', 'saldo', 'comentario']
+
+
+def iter_statement(user_id, chunk_size=2000, using=None):
+    """
+    Gera as linhas do extrato do usuário em ordem cronológica, com saldo corrente.
+
+    Lê os ramos de enviadas e recebidas com .iterator() (cada um pelo seu índice)
+    e intercala os dois em memória constante. `using` fixa o banco de leitura,
+    já que o streaming é consumido depois que a view retorna.
+    """
+
+    completed = Transaction.objects.using(using).filter(
+        status=Transaction.StatusChoices.COMPLETED
+    ).order_by('timestamp', 'id').values_list(*STATEMENT_FIELDS)
+
+    sent = completed.filter(sender_id=user_id).iterator(chunk_size=chunk_size)
+    received = completed.filter(receiver_id=user_id).iterator(chunk_size=chunk_size)
+
+    balance = None
+    for pk, timestamp, sender_id, receiver_id, amount, comment, sender_after, receiver_after in heapq.merge(
+        sent, received, key=lambda row: (row[1], row[0])
+    ):
+        if sender_id == user_id:
+            kind, counterparty, value, balance_after = 'DEBITO', receiver_id, -amount, sender_after
+        else:
+            kind, counterparty, value, balance_after = 'CREDITO', sender_id, amount, receiver_after
+
+        if balance_after is not None:
+            balance = balance_after
+        elif balance is not None:
+            balance += value
+
+        yield {
+            'id': pk,
+            'timestamp': timestamp,
+            'tipo': kind,
+            'contraparte': counterparty,
+            'valor': value,
+            'saldo': balance,
+            'comentario': comment or '',
+        }
+
+
+def _period_keys(timestamp):
+    day = timezone.localtime(timestamp).date()
+    return (
+        (StatementAggregate.PeriodChoices.DAY, day),
+        (StatementAggregate.PeriodChoices.MONTH, day.replace(day=1)),
+    )
+
+
+def _accumulate(totals, timestamp, sender_id, receiver_id, amount, sender_after, receiver_after, receiver_shard=0, only=None):
+    """
+    Soma uma transação concluída nos períodos (dia e mês) do remetente e do destinatário.
+    Débitos vão sempre para o shard 0; o crédito vai para `receiver_shard`.
+    Com `only`, soma apenas os lados dos usuários desse conjunto.
+    """
+
+    sides = (
+        (sender_id, 0, Decimal('0.00'), amount, sender_after),
+        (receiver_id, receiver_shard, amount, Decimal('0.00'), receiver_after),
+    )
+    for user_id, shard, value_in, value_out, balance_after in sides:
+        if only is not None and user_id not in only:
+            continue
+        for period, start in _period_keys(timestamp):
+            total = totals.setdefault((user_id, period, start, shard), {
+                'total_in': Decimal('0.00'),
+                'total_out': Decimal('0.00'),
+                'transaction_count': 0,
+                'closing_balance': None,
+                'last_timestamp': None,
+            })
+            total['total_in'] += value_in
+            total['total_out'] += value_out
+            total['transaction_count'] += 1
+            if total['last_timestamp'] is None or timestamp >= total['last_timestamp']:
+                total['closing_balance'] = balance_after
+                total['last_timestamp'] = timestamp
+
+
+def summarize_aggregates(queryset):
+    """
+    Junta os shards de cada período em uma linha: soma entradas, saídas e
+    contagem; o saldo de fechamento é o do shard com a transação mais recente.
+    """
+
+    latest = StatementAggregate.objects.filter(
+        user_id=OuterRef('user_id'), period=OuterRef('period'), period_start=OuterRef('period_start'),
+    ).order_by('-last_timestamp')
+
+    return queryset.values('user_id', 'period', 'period_start').annotate(
+        total_in=Sum('total_in'),
+        total_out=Sum('total_out'),
+        transaction_count=Sum('transaction_count'),
+        closing_balance=Subquery(latest.values('closing_balance')[:1]),
+    )
+
+
+def apply_completed_transactions(transactions, credit_shards=None):
+    """
+    Atualiza os agregados com transações que acabaram de ser concluídas.
+
+    Usa sempre o mesmo número de queries, independente da quantidade de transações:
+    cria as linhas que faltam, trava as existentes em ordem de id e grava com bulk_update.
+    O crédito para uma conta com shards cai no mesmo shard sorteado para o saldo
+    (`credit_shards`, {destinatário: shard}), e só esse shard é travado.
+    """
+
+    credit_shards = credit_shards or {}
+
+    totals = {}
+    for tx in transactions:
+        _accumulate(
+            totals, tx.timestamp, tx.sender_id, tx.receiver_id, tx.amount,
+            tx.sender_balance_after, tx.receiver_balance_after,
+            receiver_shard=credit_shards.get(tx.receiver_id, 0),
+        )
+    if not totals:
+        return
+
+    # Linhas do shard 0 travam por usuário; as dos outros shards, só os pares (usuário, shard) tocados.
+    plain = {user_id for user_id, _, _, shard in totals if shard == 0}
+    locked = Q(user_id__in=plain, shard=0)
+    for user_id, shard in {(user_id, shard) for user_id, _, _, shard in totals if shard != 0}:
+        locked |= Q(user_id=user_id, shard=shard)
+
+    with db_transaction.atomic():
+        StatementAggregate.objects.bulk_create(
+            [
+                StatementAggregate(user_id=user_id, period=period, period_start=start, shard=shard)
+                for user_id, period, start, shard in sorted(totals)
+            ],
+            ignore_conflicts=True,
+        )
+
+        rows = StatementAggregate.objects.select_for_update().filter(
+            locked,
+            period_start__in={key[2] for key in totals},
+        ).order_by('pk')
+
+        changed = []
+        for row in rows:
+            total = totals.get((row.user_id, row.period, row.period_start, row.shard))
+            if total is None:
+                continue
+            row.total_in += total['total_in']
+            row.total_out += total['total_out']
+            row.transaction_count += total['transaction_count']
+            if row.last_timestamp is None or total['last_timestamp'] >= row.last_timestamp:
+                row.closing_balance = total['closing_balance']
+                row.last_timestamp = total['last_timestamp']
+            changed.append(row)
+
+        StatementAggregate.objects.bulk_update(
+            changed, ['total_in', 'total_out', 'transaction_count', 'closing_balance', 'last_timestamp']
+        )
+
+
+def _rebuild_users(user_ids, batch_size, chunk_size):
+    from transaction.services import lock_accounts
+
+    members = set(user_ids)
+    with db_transaction.atomic():
+        lock_accounts(user_ids)
+
+        totals = {}
+        history = Transaction.objects.filter(
+            Q(sender_id__in=user_ids) | Q(receiver_id__in=user_ids),
+            status=Transaction.StatusChoices.COMPLETED,
+        ).order_by('timestamp').values_list(
+            'timestamp', 'sender_id', 'receiver_id', 'amount', 'sender_balance_after', 'receiver_balance_after'
+        ).iterator(chunk_size=chunk_size)
+
+        for row in history:
+            _accumulate(totals, *row, only=members)
+
+        StatementAggregate.objects.filter(user_id__in=user_ids).delete()
+        StatementAggregate.objects.bulk_create(
+            (
+                StatementAggregate(user_id=user_id, period=period, period_start=start, shard=shard, **total)
+                for (user_id, period, start, shard), total in totals.items()
+            ),
+            batch_size=batch_size,
+        )
+
+    return len(totals)
+
+
+def rebuild_aggregates(batch_size=1000, chunk_size=2000, users_per_batch=500):
+    """
+    Recalcula todos os agregados a partir do histórico de transações concluídas,
+    em lotes de `users_per_batch` usuários (ordem de id), cada um em sua transação.
+
+    Toda transação é concluída com as contas envolvidas travadas (linha do
+    usuário ou do shard de crédito), então travar as contas do lote antes de ler
+    o histórico delas bloqueia só as conclusões que tocam o lote: nenhum
+    agregado aplicado no meio é perdido, e o resto das contas segue transferindo.
+    """
+
+    created, last_id = 0, 0
+    while True:
+        user_ids = list(
+            CustomUser.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:users_per_batch]
+        )
+        if not user_ids:
+            return created
+        created += _rebuild_users(user_ids, batch_size, chunk_size)
+        last_id = user_ids[-1]
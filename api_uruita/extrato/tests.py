@@ -1,3 +1,42 @@
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from extrato.models import StatementAggregate
+from extrato.services import rebuild_aggregates
+from transaction import services
+from transaction.services import transfer_funds
+from users.models import CustomUser
+
+AGGREGATE_FIELDS = ('user_id', 'period', 'period_start', 'total_in', 'total_out', 'transaction_count', 'closing_balance')
+
+
+class RebuildAggregatesTests(TestCase):
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(cpf=cpf, username=f'usuario{n}', email=f'u{n}@a.com', password='x', balance=Decimal('100'))
+            for n, cpf in enumerate(('529.982.247-25', '935.411.347-80', '111.444.777-35'))
+        ]
+        first, second, third = (user.pk for user in self.users)
+        transfer_funds(first, third, Decimal('10.00'))
+        transfer_funds(second, third, Decimal('5.00'))
+        transfer_funds(third, first, Decimal('2.50'))
+
+    def aggregates(self):
+        return sorted(StatementAggregate.objects.values_list(*AGGREGATE_FIELDS))
+
+    def test_batches_match_incremental_aggregates(self):
+        incremental = self.aggregates()
+        StatementAggregate.objects.filter(user=self.users[0]).update(total_in=Decimal('999'))
+        StatementAggregate.objects.filter(user=self.users[1]).delete()
+
+        self.assertEqual(rebuild_aggregates(users_per_batch=2), len(incremental))
+        self.assertEqual(self.aggregates(), incremental)
+
+    def test_locks_only_each_batch(self):
+        with mock.patch.object(services, 'lock_accounts', wraps=services.lock_accounts) as lock_accounts:
+            rebuild_aggregates(users_per_batch=2)
+
+        batches = [call.args[0] for call in lock_accounts.call_args_list]
+        self.assertEqual(batches, [[self.users[0].pk, self.users[1].pk], [self.users[2].pk]])
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from extrato.views import ExtratoExportView, ExtratoSummaryView
+
+urlpatterns = [
+    path('summary/', ExtratoSummaryView.as_view(), name='extrato-summary'),
+    path('export/csv/', ExtratoExportView.as_view(), {'output': 'csv'}, name='extrato-export-csv'),
+    path('export/ndjson/', ExtratoExportView.as_view(), {'output': 'ndjson'}, name='extrato-export-ndjson'),
+]
@@ -1,3 +1,86 @@
-from django.shortcuts import render
+import csv
+import json
 
-# Create your views here.
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from api_uruita.db_routers import ReplicaReadMixin
+
+from .models import StatementAggregate
+from .serializers import StatementAggregateSerializer
+from .services import STATEMENT_COLUMNS, iter_statement, summarize_aggregates
+
+
+class _Echo:
+    """
+    Pseudo-buffer para o csv.writer devolver cada linha em vez de acumular.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_stream(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(STATEMENT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] for column in STATEMENT_COLUMNS])
+
+
+def _ndjson_stream(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class ExtratoExportView(ReplicaReadMixin, APIView):
+    """
+    Exporta o extrato completo do usuário autenticado em CSV ou NDJSON, em streaming.
+    """
+
+    permission_classes = [IsAuthenticated]
+    streams = {
+        'csv': (_csv_stream, 'text/csv; charset=utf-8'),
+        'ndjson': (_ndjson_stream, 'application/x-ndjson'),
+    }
+
+    def get(self, request, output, *args, **kwargs):
+        stream, content_type = self.streams[output]
+
+        response = StreamingHttpResponse(stream(iter_statement(request.user.pk, using=self.read_db)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="extrato.{output}"'
+        return response
+
+
+class ExtratoSummaryView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    Resumo do extrato por dia ou mês, lido dos agregados pré-calculados.
+    Aceita ?period=day|month e os filtros opcionais ?start= e ?end= (AAAA-MM-DD).
+    """
+
+    serializer_class = StatementAggregateSerializer
+    permission_classes = [IsAuthenticated]
+    periods = {
+        'day': StatementAggregate.PeriodChoices.DAY,
+        'month': StatementAggregate.PeriodChoices.MONTH,
+    }
+
+    def get_queryset(self):
+        params = self.request.query_params
+        period = self.periods.get(params.get('period', 'day'))
+        if period is None:
+            raise ValidationError({"period": "Use 'day' ou 'month'."})
+
+        queryset = StatementAggregate.objects.filter(user_id=self.request.user.pk, period=period)
+        for param, lookup in (('start', 'period_start__gte'), ('end', 'period_start__lte')):
+            if param in params:
+                value = parse_date(params[param])
+                if value is None:
+                    raise ValidationError({param: "Data inválida, use AAAA-MM-DD."})
+                queryset = queryset.filter(**{lookup: value})
+
+        return summarize_aggregates(queryset).order_by('-period_start')
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from transaction.models import Transaction
+from transaction.models import BalanceSnapshot, LedgerEntry, Transaction
 
 # Register your models here.
 admin.site.register(Transaction)
+admin.site.register(LedgerEntry)
+admin.site.register(BalanceSnapshot)
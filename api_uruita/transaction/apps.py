@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TransactionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transaction'
+
+    def ready(self):
+        from api_uruita import checks  # noqa: F401
+        from transaction import signals  # noqa: F401
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from transaction.async_views import transaction_detail, transaction_list_create
+
+urlpatterns = [
+    path('', transaction_list_create, name='async-transaction-create'),
+    path('<uuid:transaction_id>/', transaction_detail, name='async-transaction-detail'),
+]
@@ -0,0 +1,136 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_GET, require_http_methods
+from rest_framework.exceptions import NotFound, ValidationError as DRFValidationError
+
+from api_uruita.async_utils import read_json
+from api_uruita.db_routers import aread_db_for, reading_from
+from users.authentication import ajwt_required
+
+from .cache import (
+    aget_recent_transaction,
+    aremember_transaction,
+    atransactions_etag,
+    conditional_response,
+    not_modified,
+    transactions_page_key,
+)
+from .idempotency import IdempotencyKeyReused, run_idempotent
+from .models import Transaction
+from .pagination import TransactionCursorPagination
+from .serializers import TRANSACTION_ROW_FIELDS, TransactionReadSerializer, TransactionSerializer, serialize_transaction_rows
+
+
+async def _list_transactions(request):
+    """
+    Lista paginada das transações do usuário, lida com o ORM assíncrono.
+    Mesmo ETag/304 e cache de páginas de TransactionViewSet.list.
+    """
+
+    user_id = request.user.pk
+    etag = await atransactions_etag(user_id)
+    if not_modified(request, etag):
+        return conditional_response(HttpResponseNotModified(), etag)
+
+    page_key = transactions_page_key(user_id, etag, request)
+    data = await cache.aget(page_key) if page_key else None
+    if data is not None:
+        return conditional_response(JsonResponse(data), etag)
+
+    paginator = TransactionCursorPagination()
+    branches = [
+        Transaction.objects.filter(sender_id=user_id).values_list(*TRANSACTION_ROW_FIELDS, named=True),
+        Transaction.objects.filter(receiver_id=user_id).values_list(*TRANSACTION_ROW_FIELDS, named=True),
+    ]
+
+    try:
+        with reading_from(await aread_db_for(user_id)):
+            page = await paginator.apaginate_branches(branches, request)
+    except NotFound as e:
+        return JsonResponse({"detail": e.detail}, status=404)
+
+    data = paginator.get_paginated_data(serialize_transaction_rows(page))
+    if page_key:
+        await cache.aset(page_key, data, settings.TRANSACTION_PAGE_CACHE_SECONDS)
+    return conditional_response(JsonResponse(data), etag)
+
+
+async def _create_transaction(request):
+    """
+    Cria a transferência. A validação e o bloco atômico da transferência rodam
+    em uma thread (sync_to_async), já que o ORM assíncrono não abre transações.
+    """
+
+    data = read_json(request)
+    if data is None:
+        return JsonResponse({"detail": "JSON inválido."}, status=400)
+
+    def create():
+        serializer = TransactionSerializer(data=data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        transaction = serializer.save()
+        return 202 if transaction.status == Transaction.StatusChoices.PENDING else 201, serializer.data
+
+    key = request.headers.get('Idempotency-Key')
+    if key and len(key) > 255:
+        return JsonResponse({"detail": "Idempotency-Key muito longa."}, status=400)
+
+    try:
+        if key:
+            status_code, body, replayed = await sync_to_async(run_idempotent)(request.user.pk, key, data, create)
+        else:
+            (status_code, body), replayed = await sync_to_async(create)(), False
+    except DRFValidationError as e:
+        return JsonResponse(e.detail, status=400)
+    except IdempotencyKeyReused:
+        return JsonResponse({"detail": "Idempotency-Key já utilizada com outro corpo de requisição."}, status=422)
+
+    response = JsonResponse(body, status=status_code)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@require_http_methods(["GET", "POST"])
+@ajwt_required
+async def transaction_list_create(request):
+    """
+    Versão assíncrona de TransactionViewSet.
+    """
+
+    if request.method == "POST":
+        return await _create_transaction(request)
+    return await _list_transactions(request)
+
+
+@require_GET
+@ajwt_required
+async def transaction_detail(request, transaction_id):
+    """
+    Versão assíncrona de TransactionDetailView.
+    """
+
+    user_id = request.user.pk
+    etag = await atransactions_etag(user_id)
+    if not_modified(request, etag):
+        return conditional_response(HttpResponseNotModified(), etag)
+
+    data = await aget_recent_transaction(user_id, transaction_id)
+    if data is None:
+        try:
+            with reading_from(await aread_db_for(user_id)):
+                transaction = await aget_object_or_404(
+                    Transaction.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)),
+                    id=transaction_id,
+                )
+        except Http404 as e:
+            return JsonResponse({"detail": str(e)}, status=404)
+
+        data = TransactionReadSerializer(transaction).data
+        await aremember_transaction(user_id, data)
+
+    return conditional_response(JsonResponse(data), etag)
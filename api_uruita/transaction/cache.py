@@ -0,0 +1,158 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from api_uruita.caching import is_shared_cache
+
+
+def recent_transactions_key(user_id):
+    return f"transaction:recent:{user_id}"
+
+
+def get_recent_transaction(user_id, transaction_id):
+    """
+    Transação já serializada do cache de recentes do usuário, ou None.
+    Só há cache de recentes com cache compartilhado: com um cache por processo,
+    a liquidação ou escrita feita em outro processo não o invalidaria.
+    """
+
+    if not is_shared_cache():
+        return None
+    return (cache.get(recent_transactions_key(user_id)) or {}).get(str(transaction_id))
+
+
+async def aget_recent_transaction(user_id, transaction_id):
+    if not is_shared_cache():
+        return None
+    return (await cache.aget(recent_transactions_key(user_id)) or {}).get(str(transaction_id))
+
+
+def _remember(recent, data):
+    recent.pop(data['id'], None)
+    recent[data['id']] = data
+    while len(recent) > settings.TRANSACTION_RECENT_CACHE_SIZE:
+        recent.pop(next(iter(recent)))
+    return recent
+
+
+def remember_transaction(user_id, data):
+    """
+    Guarda a transação serializada entre as recentes do usuário (as mais
+    antigas saem primeiro), por TRANSACTION_RECENT_CACHE_SECONDS.
+    """
+
+    if not is_shared_cache():
+        return
+    key = recent_transactions_key(user_id)
+    cache.set(key, _remember(cache.get(key) or {}, data), settings.TRANSACTION_RECENT_CACHE_SECONDS)
+
+
+async def aremember_transaction(user_id, data):
+    if not is_shared_cache():
+        return
+    key = recent_transactions_key(user_id)
+    await cache.aset(key, _remember(await cache.aget(key) or {}, data), settings.TRANSACTION_RECENT_CACHE_SECONDS)
+
+
+def transactions_version_key(user_id):
+    return f"transaction:version:{user_id}"
+
+
+def _new_version():
+    # Token aleatório em vez de contador: se a chave sair do cache, um contador
+    # recomeçaria e poderia repetir um ETag antigo; um token novo nunca repete.
+    return uuid.uuid4().hex
+
+
+def get_transactions_version(user_id):
+    """
+    Versão das transações do usuário; muda a cada invalidate_user_transactions.
+    """
+
+    key = transactions_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, settings.TRANSACTION_VERSION_SECONDS):
+            version = cache.get(key, version)
+    return version
+
+
+async def aget_transactions_version(user_id):
+    key = transactions_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(key, version, settings.TRANSACTION_VERSION_SECONDS):
+            version = await cache.aget(key, version)
+    return version
+
+
+def transactions_etag(user_id):
+    """
+    ETag das transações do usuário, ou None sem cache compartilhado: com um
+    cache por processo, a troca de versão feita em um worker (ou no comando
+    settle_transactions) não chegaria aos outros, que seguiriam respondendo 304.
+    """
+
+    if not is_shared_cache():
+        return None
+    return quote_etag(get_transactions_version(user_id))
+
+
+async def atransactions_etag(user_id):
+    if not is_shared_cache():
+        return None
+    return quote_etag(await aget_transactions_version(user_id))
+
+
+def not_modified(request, etag):
+    """
+    True se o If-None-Match da requisição já tem o ETag atual.
+    """
+
+    header = request.headers.get('If-None-Match')
+    return bool(etag and header) and (header.strip() == '*' or etag in parse_etags(header))
+
+
+def conditional_response(response, etag):
+    """
+    Coloca o ETag na resposta (200 ou 304) e varia o cache HTTP por Authorization,
+    já que a versão é por usuário.
+    """
+
+    if etag is not None:
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def transactions_page_key(user_id, etag, request):
+    """
+    Chave da página da listagem em cache, ou None se o cache de páginas está
+    desligado (TRANSACTION_PAGE_CACHE_SECONDS = 0 ou sem ETag).
+    """
+
+    if etag is None or not settings.TRANSACTION_PAGE_CACHE_SECONDS:
+        return None
+    # Host entra na chave porque o link "next" da página é absoluto.
+    url = hashlib.sha1(f"{request.get_host()}{request.get_full_path()}".encode()).hexdigest()
+    return f"transaction:page:{user_id}:{etag}:{url}"
+
+
+def invalidate_user_transactions(*user_ids):
+    """
+    Ponto único de invalidação: qualquer escrita que crie ou altere transações
+    dos usuários deve chamá-lo (após o commit). Troca também a versão, o que
+    invalida os ETags e as páginas em cache da listagem.
+    """
+
+    cache.delete_many([recent_transactions_key(user_id) for user_id in user_ids])
+    cache.set_many(
+        {transactions_version_key(user_id): _new_version() for user_id in user_ids},
+        settings.TRANSACTION_VERSION_SECONDS,
+    )
@@ -0,0 +1,109 @@
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+
+from api_uruita.lru import LRUCache
+from api_uruita.purging import delete_in_batches
+from transaction.models import IdempotencyKey
+
+Replay = namedtuple('Replay', ['request_hash', 'status', 'body', 'expires_at'])
+
+_replays = LRUCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+class IdempotencyKeyReused(Exception):
+    """
+    A chave já foi usada com um corpo de requisição diferente.
+    """
+
+
+def request_fingerprint(data):
+    """
+    Hash estável do corpo da requisição, para detectar reuso da chave com outro conteúdo.
+    """
+
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def find_replay(user_id, key):
+    """
+    Procura a resposta gravada para a chave, primeiro no LRU do processo e depois na tabela.
+    """
+
+    now = timezone.now()
+    replay = _replays.get((user_id, key))
+    if replay is not None and replay.expires_at > now:
+        return replay
+
+    row = IdempotencyKey.objects.filter(
+        user_id=user_id, key=key, expires_at__gt=now
+    ).values_list('request_hash', 'response_status', 'response_body', 'expires_at').first()
+    if row is None:
+        return None
+
+    replay = Replay(*row)
+    _replays.set((user_id, key), replay)
+    return replay
+
+
+def store_replay(user_id, key, request_hash, status, body):
+    """
+    Grava a resposta da chave. Deve ser chamada dentro do mesmo bloco atômico
+    da transferência: se a chave já existir, o IntegrityError desfaz tudo.
+    Uma linha expirada e ainda não purgada da mesma chave é substituída.
+    """
+
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user_id=user_id, key=key, expires_at__lte=now).delete()
+
+    expires_at = now + settings.IDEMPOTENCY_KEY_TTL
+    IdempotencyKey.objects.create(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        response_status=status,
+        response_body=body,
+        expires_at=expires_at,
+    )
+
+    replay = Replay(request_hash, status, json.loads(json.dumps(body, cls=DjangoJSONEncoder)), expires_at)
+    db_transaction.on_commit(lambda: _replays.set((user_id, key), replay))
+
+
+def run_idempotent(user_id, key, data, create):
+    """
+    Executa `create` (que retorna (status, corpo)) uma única vez por chave.
+    Retentativas recebem a resposta gravada; retorna (status, corpo, repetida).
+    """
+
+    request_hash = request_fingerprint(data)
+    replay = find_replay(user_id, key)
+    if replay is None:
+        try:
+            with db_transaction.atomic():
+                status, body = create()
+                store_replay(user_id, key, request_hash, status, body)
+            return status, body, False
+        except IntegrityError:
+            # Outra requisição com a mesma chave confirmou primeiro.
+            replay = find_replay(user_id, key)
+            if replay is None:
+                raise
+
+    if replay.request_hash != request_hash:
+        raise IdempotencyKeyReused(key)
+    return replay.status, replay.body, True
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Remove as chaves expiradas em lotes, para não travar a tabela.
+    """
+
+    return delete_in_batches(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()), batch_size)
@@ -0,0 +1,71 @@
+import json
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from api_uruita.benchmarks import benchmark_databases, seed_users, summarize
+from transaction.services import set_credit_shards, transfer_funds
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede pagamentos/s de N pagadores simultâneos para uma única conta recebedora, "
+        "sem shards (K=1, todo crédito trava a linha do recebedor) e com os créditos "
+        "espalhados em K shards de saldo (cada crédito trava só o shard sorteado). "
+        "No SQLite os escritores são serializados pelo próprio banco; rode com PostgreSQL "
+        "(DATABASE_URL) para ver o efeito das travas por linha."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payers', type=int, default=16, help="Threads pagando ao mesmo tempo.")
+        parser.add_argument('--payments', type=int, default=100, help="Pagamentos por thread.")
+        parser.add_argument('--shards', type=int, default=16)
+
+    def _measure(self, merchant_id, payer_ids, payments):
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def payer(payer_id):
+            own, failed = [], 0
+            try:
+                for _ in range(payments):
+                    begin = time.perf_counter()
+                    try:
+                        transfer_funds(payer_id, merchant_id, Decimal('1.00'))
+                        own.append(time.perf_counter() - begin)
+                    except OperationalError:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(own)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=payer, args=(payer_id,)) for payer_id in payer_ids]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        report = summarize(latencies, elapsed)
+        report['errors'] = sum(errors)
+        return report
+
+    def handle(self, *args, **options):
+        report = {key: options[key] for key in ('payers', 'payments', 'shards')}
+        with tempfile.TemporaryDirectory() as tmp_dir, benchmark_databases(tmp_dir):
+            report['vendor'] = connection.vendor
+            merchant_id, *payer_ids = seed_users(options['payers'] + 1)
+            connection.close()
+
+            for shards in (1, options['shards']):
+                set_credit_shards(merchant_id, shards)
+                report[f'shards_{shards}'] = self._measure(merchant_id, payer_ids, options['payments'])
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,121 @@
+import json
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from api_uruita.benchmarks import benchmark_databases, seed_users
+from transaction.services import ledger_balance, transfer_funds
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede transferências/s e taxa de erro com N escritores concorrentes no SQLite, "
+        "chamando transfer_funds por conexões do Django: journal de rollback com "
+        "BEGIN DEFERRED (antes) contra os OPTIONS configurados em settings — WAL via "
+        "init_command, transaction_mode IMMEDIATE e timeout (depois)."
+    )
+
+    # OPTIONS do banco em cada modo; None usa os de settings.DATABASES.
+    modes = {
+        'rollback_deferred': {
+            'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL',
+            'transaction_mode': 'DEFERRED',
+            'timeout': 5,
+        },
+        'wal_immediate': None,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--transfers', type=int, default=200, help="Transferências por escritor.")
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--accounts', type=int, default=100)
+
+    def _measure(self, writers, transfers, readers, accounts):
+        user_ids = seed_users(accounts)
+        connection.close()
+
+        done = threading.Event()
+        counts = {'ok': 0, 'errors': 0, 'reads': 0}
+        lock = threading.Lock()
+
+        def writer(index):
+            ok = errors = 0
+            try:
+                for n in range(transfers):
+                    sender = (index * transfers + n) % accounts
+                    try:
+                        transfer_funds(user_ids[sender], user_ids[(sender + 1) % accounts], Decimal('0.01'))
+                        ok += 1
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connection.close()
+            with lock:
+                counts['ok'] += ok
+                counts['errors'] += errors
+
+        def reader():
+            reads = 0
+            try:
+                while not done.is_set():
+                    try:
+                        ledger_balance(user_ids[reads % accounts])
+                        reads += 1
+                    except OperationalError:
+                        pass
+            finally:
+                connection.close()
+            with lock:
+                counts['reads'] += reads
+
+        reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        for thread in reader_threads:
+            thread.start()
+
+        started = time.perf_counter()
+        for thread in writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+
+        attempted = writers * transfers
+        return {
+            'transfers_per_sec': round(counts['ok'] / elapsed, 2),
+            'error_rate': round(counts['errors'] / attempted, 4),
+            'errors': counts['errors'],
+            'reads_per_sec': round(counts['reads'] / elapsed, 2),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Este benchmark compara configurações do SQLite; o banco default é outro.")
+
+        params = {key: options[key] for key in ('writers', 'transfers', 'readers', 'accounts')}
+        report = dict(params)
+        # As threads abrem conexões a partir deste mesmo settings_dict, então
+        # trocar os OPTIONS aqui vale para todos os escritores e leitores.
+        settings_dict = connection.settings_dict
+        configured = settings_dict['OPTIONS']
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for name, mode_options in self.modes.items():
+                    settings_dict['OPTIONS'] = configured if mode_options is None else mode_options
+                    report[name] = {'options': settings_dict['OPTIONS']}
+                    # Banco novo por modo: o journal_mode=WAL fica gravado no arquivo.
+                    with benchmark_databases(tmp_dir):
+                        report[name].update(self._measure(**params))
+        finally:
+            settings_dict['OPTIONS'] = configured
+
+        self.stdout.write(json.dumps(report, indent=2))
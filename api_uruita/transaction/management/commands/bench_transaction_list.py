@@ -0,0 +1,79 @@
+import json
+import tempfile
+import time
+from importlib.util import find_spec
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api_uruita.benchmarks import benchmark_databases, seed_transactions, seed_users
+from transaction.models import Transaction
+from transaction.serializers import TRANSACTION_ROW_FIELDS, TransactionSerializer, serialize_transaction_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara linhas/s da listagem de transações: TransactionSerializer sobre modelos "
+        "(antes) contra o caminho rápido com values_list, com JSONRenderer e ORJSONRenderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=3, help="Rodadas por variante (vale a melhor).")
+
+    def _variants(self, user_id):
+        ordering = ('-timestamp', '-id')
+
+        def models():
+            return list(Transaction.objects.filter(sender_id=user_id).union(
+                Transaction.objects.filter(receiver_id=user_id), all=True
+            ).order_by(*ordering))
+
+        def rows():
+            return list(
+                Transaction.objects.filter(sender_id=user_id).values_list(*TRANSACTION_ROW_FIELDS, named=True).union(
+                    Transaction.objects.filter(receiver_id=user_id).values_list(*TRANSACTION_ROW_FIELDS, named=True),
+                    all=True,
+                ).order_by(*ordering)
+            )
+
+        def serializer(page):
+            return TransactionSerializer(page, many=True).data
+
+        variants = {
+            'model_serializer': (models, serializer, JSONRenderer()),
+            'values_fast_path': (rows, serialize_transaction_rows, JSONRenderer()),
+        }
+        if find_spec('orjson'):
+            from api_uruita.renderers import ORJSONRenderer
+
+            variants['values_fast_path_orjson'] = (rows, serialize_transaction_rows, ORJSONRenderer())
+        return variants
+
+    def _measure(self, fetch, serialize, renderer, repeat):
+        best_total = best_render = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            page = fetch()
+            fetched = time.perf_counter()
+            renderer.render({'next': None, 'results': serialize(page)})
+            finished = time.perf_counter()
+
+            best_total = min(best_total or float('inf'), finished - started)
+            best_render = min(best_render or float('inf'), finished - fetched)
+        return len(page), best_total, best_render
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp_dir, benchmark_databases(tmp_dir):
+            sender_id, receiver_id = seed_users(2)
+            seed_transactions([sender_id, receiver_id], options['rows'])
+
+            report = {'rows': options['rows'], 'repeat': options['repeat']}
+            for name, (fetch, serialize, renderer) in self._variants(sender_id).items():
+                count, total, render = self._measure(fetch, serialize, renderer, options['repeat'])
+                report[name] = {
+                    'rows_per_sec': round(count / total),
+                    'serialize_render_rows_per_sec': round(count / render),
+                }
+
+        self.stdout.write(json.dumps(report, indent=2))
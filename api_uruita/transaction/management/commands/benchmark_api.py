@@ -0,0 +1,200 @@
+import itertools
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from api_uruita.benchmarks import (
+    BENCH_PASSWORD,
+    benchmark_databases,
+    make_cpf,
+    seed_transactions,
+    seed_users,
+    summarize,
+    timed,
+)
+from transaction.cache import invalidate_user_transactions
+
+# Máximo de queries por requisição (já aquecida) em cada endpoint. Um N+1
+# novo estoura o orçamento e o comando termina com erro. A contagem é feita
+# com os caches de transações frios (página, recentes e versão), senão
+# listagem e detalhe sairiam do cache com 0 queries e nunca estourariam.
+QUERY_BUDGETS = {
+    'register': 7,
+    'login': 2,
+    'refresh': 1,
+    'transfer': 13,
+    'list': 1,
+    'detail': 1,
+}
+
+
+class Session:
+    """
+    Cliente autenticado de um usuário semeado, usado por uma thread do benchmark.
+    """
+
+    def __init__(self, cpf, receiver_cpf):
+        self.cpf = cpf
+        self.receiver_cpf = receiver_cpf
+        self.client = APIClient()
+
+        response = self.client.post('/api/v1/user/login/', {'cpf': cpf, 'password': BENCH_PASSWORD}, format='json')
+        _expect(response, 200, 'login')
+        self.refresh = response.data['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        response = self.client.post(
+            '/api/v1/transaction/', {'receiver_cpf': receiver_cpf, 'amount': '0.01'}, format='json'
+        )
+        _expect(response, 201, 'transfer')
+        self.user_id = response.data['sender']
+        self.transaction_id = response.data['id']
+
+
+def _expect(response, status_code, name):
+    if response.status_code != status_code:
+        raise CommandError(f"{name}: esperado HTTP {status_code}, recebido {response.status_code}: {response.content[:300]!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark dos endpoints principais (cadastro, login, refresh, transferência, "
+        "listagem e detalhe) em bancos de teste descartáveis: semeia N usuários e M "
+        "transações, mede p50/p99 e vazão em processo e com threads concorrentes, "
+        "confere o orçamento de queries por endpoint e emite um relatório JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--transactions', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=200, help="Requisições por endpoint em cada rodada.")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--output', help="Arquivo do relatório JSON (padrão: stdout).")
+
+    def _scenarios(self, session, registrations):
+        client = session.client
+        anonymous = APIClient()
+
+        def register(n):
+            number = next(registrations)
+            response = anonymous.post('/api/v1/user/register/', {
+                'cpf': make_cpf(number),
+                'username': f'reg{number}',
+                'email': f'reg{number}@bench.local',
+                'password': BENCH_PASSWORD,
+            }, format='json')
+            _expect(response, 201, 'register')
+
+        def login(n):
+            response = anonymous.post(
+                '/api/v1/user/login/', {'cpf': session.cpf, 'password': BENCH_PASSWORD}, format='json'
+            )
+            _expect(response, 200, 'login')
+
+        def refresh(n):
+            _expect(anonymous.post('/api/v1/user/refresh/', {'refresh': session.refresh}, format='json'), 200, 'refresh')
+
+        def transfer(n):
+            response = client.post(
+                '/api/v1/transaction/', {'receiver_cpf': session.receiver_cpf, 'amount': '0.01'}, format='json'
+            )
+            _expect(response, 201, 'transfer')
+
+        def listing(n):
+            _expect(client.get('/api/v1/transaction/'), 200, 'list')
+
+        def detail(n):
+            _expect(client.get(f'/api/v1/transaction/{session.transaction_id}/'), 200, 'detail')
+
+        return {
+            'register': register,
+            'login': login,
+            'refresh': refresh,
+            'transfer': transfer,
+            'list': listing,
+            'detail': detail,
+        }
+
+    def _count_queries(self, call, session):
+        with ExitStack() as stack:
+            stack.enter_context(override_settings(TRANSACTION_PAGE_CACHE_SECONDS=0))
+            invalidate_user_transactions(session.user_id)
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            call(0)
+        return sum(len(context) for context in contexts)
+
+    def _concurrent(self, name, sessions, registrations, per_thread):
+        def worker(session):
+            try:
+                return timed(self._scenarios(session, registrations)[name], per_thread)[0]
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(len(sessions)) as executor:
+            started = time.perf_counter()
+            results = list(executor.map(worker, sessions))
+            elapsed = time.perf_counter() - started
+
+        return summarize([latency for latencies in results for latency in latencies], elapsed)
+
+    def _run(self, options):
+        started = time.perf_counter()
+        user_ids = seed_users(options['users'])
+        seed_transactions(user_ids, options['transactions'])
+        seeding = round(time.perf_counter() - started, 2)
+
+        threads = max(1, min(options['threads'], options['users'] - 1))
+        sessions = [Session(make_cpf(1 + n), make_cpf(1 + (n + 1) % options['users'])) for n in range(threads)]
+        registrations = itertools.count(500_000_000)
+
+        endpoints, violations = {}, []
+        for name, budget in QUERY_BUDGETS.items():
+            call = self._scenarios(sessions[0], registrations)[name]
+            call(0)  # aquece caches (principal, LRUs) antes de contar
+            queries = self._count_queries(call, sessions[0])
+            if queries > budget:
+                violations.append(f"{name}: {queries} > {budget}")
+
+            endpoints[name] = {
+                'queries': queries,
+                'query_budget': budget,
+                'in_process': summarize(*timed(call, options['requests'])),
+                'concurrent': self._concurrent(name, sessions, registrations, max(1, options['requests'] // threads)),
+            }
+            self.stderr.write(f"{name}: ok")
+
+        report = {
+            'vendor': connections['default'].vendor,
+            'users': options['users'],
+            'transactions': options['transactions'],
+            'requests': options['requests'],
+            'threads': threads,
+            'seeding_seconds': seeding,
+            'endpoints': endpoints,
+        }
+        return report, violations
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError("São necessários pelo menos 2 usuários.")
+
+        # Sem rate limiting: o benchmark repete login com o mesmo CPF de propósito.
+        with tempfile.TemporaryDirectory() as tmp_dir, benchmark_databases(tmp_dir), override_settings(RATELIMIT_RATES={}):
+            report, violations = self._run(options)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if violations:
+            raise CommandError("Orçamento de queries excedido: " + "; ".join(violations))
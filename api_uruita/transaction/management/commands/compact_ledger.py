@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from transaction.services import compact_ledger
+
+
+class Command(BaseCommand):
+    help = "Consolida os lançamentos do razão em snapshots de saldo e atualiza CustomUser.balance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Continua rodando em segundo plano.")
+        parser.add_argument('--interval', type=int, default=30, help="Intervalo entre execuções com --loop (segundos).")
+
+    def handle(self, *args, **options):
+        while True:
+            compacted = compact_ledger(batch_size=options['batch_size'])
+            self.stdout.write(f"{compacted} saldo(s) consolidado(s).")
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from transaction.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Remove as Idempotency-Keys expiradas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(batch_size=options['batch_size'])
+        self.stdout.write(f"{deleted} chave(s) removida(s).")
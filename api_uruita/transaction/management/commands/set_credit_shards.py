@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from transaction.services import set_credit_shards
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Define em quantos shards de saldo (e de agregado do extrato) os créditos de uma conta são "
+        "espalhados. Use em contas que recebem muitos pagamentos simultâneos (ex.: lojistas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('cpf')
+        parser.add_argument('--shards', type=int, required=True)
+
+    def handle(self, *args, **options):
+        user_id = CustomUser.objects.filter(cpf=options['cpf']).values_list('pk', flat=True).first()
+        if user_id is None:
+            raise CommandError("Usuário não encontrado.")
+
+        try:
+            set_credit_shards(user_id, options['shards'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"credit_shards = {options['shards']}.")
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_uruita.caching import is_shared_cache
+from transaction.services import settle_pending_transactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Liquida as transações PENDING em lotes (modo TRANSACTION_SETTLEMENT_MODE='deferred'). "
+        "Vários processos podem rodar ao mesmo tempo: cada lote é reivindicado com SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help="Continua liquidando em segundo plano.")
+        parser.add_argument('--interval', type=float, default=0.5, help="Espera quando não há pendentes (segundos).")
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            raise CommandError(
+                "settle_transactions exige cache compartilhado (CACHE_URL): sem ele, os workers web "
+                "continuariam servindo as transações como PENDING depois da liquidação."
+            )
+
+        while True:
+            completed, failed = settle_pending_transactions(batch_size=options['batch_size'])
+            if completed or failed:
+                self.stdout.write(f"{completed} concluída(s), {failed} falha(s).")
+
+            if not completed and not failed:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
@@ -2,6 +2,7 @@ import uuid
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from users.models import CustomUser
 
 class Transaction(models.Model):
@@ -22,37 +23,114 @@ class Transaction(models.Model):
     status = models.CharField(max_length=10, choices=StatusChoices.choices, default=StatusChoices.PENDING)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["sender", "-timestamp", "-id"], name="transaction_sender_ts_idx"),
+            models.Index(fields=["receiver", "-timestamp", "-id"], name="transaction_receiver_ts_idx"),
+        ]
+
     def clean(self):
+        from transaction.services import ledger_balance
+
         if self.amount <= 0:
             raise ValidationError(_("O valor da transação deve ser positivo."))
         if self.sender == self.receiver:
             raise ValidationError(_("Não é possível transferir para si mesmo."))
-        if self.status == self.StatusChoices.COMPLETED and self.sender.balance < self.amount:
+        if self.status == self.StatusChoices.COMPLETED and ledger_balance(self.sender_id) < self.amount:
             raise ValidationError(_("Saldo insuficiente para a transação."))
 
     def confirm_payment(self):
+        from transaction.services import transfer_funds
+
         if self.status != self.StatusChoices.PENDING:
             raise ValidationError(_("Apenas transações pendentes podem ser confirmadas."))
 
-        if self.sender.balance < self.amount:
-            self.status = self.StatusChoices.FAILED
-            self.save(update_fields=["status"])
+        transfer_funds(self.sender_id, self.receiver_id, self.amount, pending=self)
+
+        if self.status == self.StatusChoices.FAILED:
             raise ValidationError(_("Saldo insuficiente para completar a transação."))
 
-        self.sender_balance_before = self.sender.balance
-        self.receiver_balance_before = self.receiver.balance
+    def __str__(self):
+        return f"{self.sender} → {self.receiver} | {self.amount} | {self.status}"
 
-        self.sender.balance -= self.amount
-        self.receiver.balance += self.amount
 
-        self.sender_balance_after = self.sender.balance
-        self.receiver_balance_after = self.receiver.balance
+class LedgerEntry(models.Model):
+    """
+    Lançamento imutável de débito (valor negativo) ou crédito (valor positivo).
+    O razão é a fonte da verdade dos saldos; CustomUser.balance é só uma projeção.
+    Lançamentos líquidos da liquidação diferida cobrem várias transações e ficam sem `transaction`,
+    assim como os ajustes manuais de saldo (adjust_balance).
+    Créditos para contas com credit_shards > 1 levam o shard de saldo sorteado (ver BalanceSnapshot).
+    """
 
-        self.sender.save()
-        self.receiver.save()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="ledger_entries")
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.CASCADE, related_name="ledger_entries", null=True, blank=True
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    shard = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
 
-        self.status = self.StatusChoices.COMPLETED
-        self.save(update_fields=["status", "sender_balance_before", "sender_balance_after", "receiver_balance_before", "receiver_balance_after"])
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="ledger_user_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValidationError(_("Lançamentos do razão não podem ser alterados."))
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError(_("Lançamentos do razão não podem ser removidos."))
 
     def __str__(self):
-        return f"{self.sender} → {self.receiver} | {self.amount} | {self.status}"
+        return f"{self.user} | {self.amount}"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Saldo consolidado de um shard do usuário até o lançamento `last_entry_id`.
+    Atualizado periodicamente pela compactação do razão.
+
+    Contas comuns têm só o shard 0. Contas com credit_shards = K têm K linhas,
+    criadas por set_credit_shards: cada crédito trava só a linha do shard
+    sorteado, e o saldo da conta é a soma dos shards mais os lançamentos posteriores.
+    """
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="balance_snapshots")
+    shard = models.PositiveSmallIntegerField(default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_entry_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "shard"], name="unique_balance_snapshot_shard"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} #{self.shard} | {self.balance} até #{self.last_entry_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Resposta gravada de um POST com Idempotency-Key, usada para responder
+    retentativas do cliente sem executar a transferência de novo.
+    """
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} | {self.key}"
@@ -0,0 +1,105 @@
+import base64
+import uuid
+
+from django.db import connections
+from django.db.models import Q, Subquery
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) em (timestamp, id), do mais recente para o mais antigo.
+
+    Recebe os ramos indexados da consulta (ex.: enviadas e recebidas), limita cada
+    um a uma página e junta com UNION ALL, então o custo não cresce com o histórico.
+    Bancos sem LIMIT dentro de UNION (SQLite) limitam cada ramo por uma subquery
+    `pk IN (... LIMIT n)`.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-timestamp', '-id')
+
+    def _params(self, request):
+        # Aceita tanto o Request do DRF quanto o HttpRequest das views async.
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(self._params(request).get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        raw = f"{row.timestamp.isoformat()}|{row.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = self._params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode()).decode()
+            timestamp, pk = raw.split('|')
+            timestamp = parse_datetime(timestamp)
+            pk = uuid.UUID(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound("Cursor inválido.")
+
+        if timestamp is None:
+            raise NotFound("Cursor inválido.")
+        return timestamp, pk
+
+    def _page_queryset(self, branches, request):
+        self.request = request
+        self.page_size_used = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        limited = []
+        for branch in branches:
+            if position is not None:
+                timestamp, pk = position
+                branch = branch.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+            page = branch.order_by(*self.ordering)[:self.page_size_used + 1]
+            if connections[branch.db].features.supports_slicing_ordering_in_compound:
+                branch = page
+            else:
+                branch = branch.filter(pk__in=Subquery(page.values('pk')))
+            limited.append(branch)
+
+        queryset = limited[0].union(*limited[1:], all=True).order_by(*self.ordering)
+        return queryset[:self.page_size_used + 1]
+
+    def _set_page(self, rows):
+        self.has_next = len(rows) > self.page_size_used
+        self.page = rows[:self.page_size_used]
+        return self.page
+
+    def paginate_branches(self, branches, request, view=None):
+        return self._set_page(list(self._page_queryset(branches, request)))
+
+    async def apaginate_branches(self, branches, request, view=None):
+        return self._set_page([row async for row in self._page_queryset(branches, request)])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -1,8 +1,14 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from api_uruita.metrics import TimedListSerializer, TimedSerializerMixin
 from .models import Transaction
-from users.models import CustomUser
+from .services import create_pending_transfer, ledger_balance, transfer_funds
+from users.cache import forget_user, resolve_cpf
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer para transações, permitindo transferência por CPF.
     """
@@ -21,6 +27,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'sender', 'receiver',  'receiver_cpf', 'amount',
             'sender_balance_before', 'sender_balance_after',
@@ -38,45 +45,146 @@ class TransactionSerializer(serializers.ModelSerializer):
         sender = self.context['request'].user
         receiver_cpf = attrs.pop('receiver_cpf', None)
 
-        try:
-            receiver = CustomUser.objects.get(cpf=receiver_cpf)
-        except CustomUser.DoesNotExist:
+        receiver = resolve_cpf(receiver_cpf)
+        if receiver is None:
             raise serializers.ValidationError({"receiver_cpf": "Usuário com este CPF não encontrado."})
+        receiver_id, receiver_active = receiver
+        if not receiver_active:
+            raise serializers.ValidationError({"receiver_cpf": "A conta do destinatário está inativa."})
 
         if amount <= 0:
             raise serializers.ValidationError({"amount": "O valor da transação deve ser positivo."})
-        if sender == receiver:
+        if sender.pk == receiver_id:
             raise serializers.ValidationError({"sender": "Não é possível transferir para si mesmo."})
-        if sender.balance < amount:
+        if ledger_balance(sender.pk) < amount:
             raise serializers.ValidationError({"amount": "Saldo insuficiente para esta transação."})
 
-        attrs['receiver'] = receiver
+        attrs['receiver_id'] = receiver_id
+        attrs['receiver_cpf'] = receiver_cpf
         return attrs
  
     def create(self, validated_data): 
         """
-        Lógica de criação de transação, incluindo atualização de saldo.
+        Lógica de criação de transação, delegando a atualização de saldo ao serviço de transferência.
+        No modo de liquidação diferida, só registra a transação pendente.
         """
 
         sender = self.context['request'].user
-        receiver = validated_data.pop('receiver') 
-        amount = validated_data.get('amount')
-
-        sender_balance_before = sender.balance
-        receiver_balance_before = receiver.balance
-
-        # Atualizar os saldos
-        sender.balance -= amount 
-        receiver.balance += amount
-        sender.save()
-        receiver.save()
-
-        validated_data['sender'] = sender
-        validated_data['receiver'] = receiver 
-        validated_data['sender_balance_before'] = sender_balance_before
-        validated_data['sender_balance_after'] = sender.balance 
-        validated_data['receiver_balance_before'] = receiver_balance_before
-        validated_data['receiver_balance_after'] = receiver.balance
-        validated_data['status'] = Transaction.StatusChoices.COMPLETED
-
-        return super().create(validated_data)
+        receiver_id = validated_data.pop('receiver_id')
+        transfer = create_pending_transfer if settings.TRANSACTION_SETTLEMENT_MODE == 'deferred' else transfer_funds
+
+        try:
+            return transfer(
+                sender.pk,
+                receiver_id,
+                validated_data['amount'],
+                comment=validated_data.get('comment'),
+            )
+        except DjangoValidationError as e:
+            # O cache pode guardar um usuário já removido ou desativado: descarta a entrada.
+            forget_user(validated_data.get('receiver_cpf'))
+            field = "receiver_cpf" if e.code == 'receiver_inactive' else "amount"
+            raise serializers.ValidationError({field: e.messages})
+
+
+class TransactionBatchItemSerializer(serializers.Serializer):
+    receiver_cpf = serializers.CharField()
+    amount = serializers.DecimalField(max_digits = 10, decimal_places=2)
+    comment = serializers.CharField(required=False, allow_blank = True, allow_null = True)
+
+
+class TransactionBatchSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Serializer para transferências em lote a partir do usuário autenticado.
+    """
+
+    class ModeChoices:
+        ALL_OR_NOTHING = 'all_or_nothing'
+        BEST_EFFORT = 'best_effort'
+
+    mode = serializers.ChoiceField(
+        choices=[ModeChoices.ALL_OR_NOTHING, ModeChoices.BEST_EFFORT],
+        default=ModeChoices.ALL_OR_NOTHING,
+    )
+    items = serializers.ListField(
+        child=TransactionBatchItemSerializer(),
+        min_length=1,
+        max_length=settings.TRANSACTION_BATCH_MAX_ITEMS,
+    )
+
+
+_money = serializers.DecimalField(max_digits=10, decimal_places=2)
+_timestamp = serializers.DateTimeField()
+
+
+class TransactionReadSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    Serializer somente leitura da transação: mesma saída do TransactionSerializer,
+    sem a montagem de campos graváveis e validação do ModelSerializer.
+    """
+
+    def to_representation(self, instance):
+        def money(value):
+            return None if value is None else _money.to_representation(value)
+
+        return {
+            'id': str(instance.id),
+            'sender': instance.sender_id,
+            'receiver': instance.receiver_id,
+            'amount': money(instance.amount),
+            'sender_balance_before': money(instance.sender_balance_before),
+            'sender_balance_after': money(instance.sender_balance_after),
+            'receiver_balance_before': money(instance.receiver_balance_before),
+            'receiver_balance_after': money(instance.receiver_balance_after),
+            'comment': instance.comment,
+            'status': instance.status,
+            'timestamp': _timestamp.to_representation(instance.timestamp),
+        }
+
+
+TRANSACTION_ROW_FIELDS = (
+    'id', 'sender_id', 'receiver_id', 'amount',
+    'sender_balance_before', 'sender_balance_after',
+    'receiver_balance_before', 'receiver_balance_after',
+    'comment', 'status', 'timestamp',
+)
+
+
+def serialize_transaction_rows(rows):
+    """
+    Caminho rápido da listagem: formata as tuplas de values_list(*TRANSACTION_ROW_FIELDS)
+    em um laço só, sem instanciar modelos nem campos de serializer.
+
+    Saída idêntica à do TransactionSerializer: os decimais já vêm do banco com
+    2 casas, e o timestamp segue o formato ISO 8601 do DRF ('Z' para UTC).
+    """
+
+    if api_settings.DATETIME_FORMAT != ISO_8601:
+        format_timestamp = _timestamp.to_representation
+    else:
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+        def format_timestamp(value):
+            value = value.astimezone(tz).isoformat() if tz is not None else value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    def money(value):
+        return None if value is None else f'{value:f}'
+
+    return [
+        {
+            'id': str(pk),
+            'sender': sender_id,
+            'receiver': receiver_id,
+            'amount': f'{amount:f}',
+            'sender_balance_before': money(sender_before),
+            'sender_balance_after': money(sender_after),
+            'receiver_balance_before': money(receiver_before),
+            'receiver_balance_after': money(receiver_after),
+            'comment': comment,
+            'status': status,
+            'timestamp': format_timestamp(timestamp),
+        }
+        for pk, sender_id, receiver_id, amount, sender_before, sender_after,
+            receiver_before, receiver_after, comment, status, timestamp in rows
+    ]
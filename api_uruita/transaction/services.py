@@ -0,0 +1,556 @@
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction as db_transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from api_uruita.db_routers import mark_recent_write
+from api_uruita.lru import LRUCache
+from extrato.services import apply_completed_transactions
+from transaction.cache import invalidate_user_transactions
+from transaction.models import BalanceSnapshot, LedgerEntry, Transaction
+from users.models import CustomUser
+
+# credit_shards por usuário. Um valor antigo só faz o crédito cair em um shard
+# a mais ou a menos: as linhas de shard nunca são removidas e a leitura soma todas.
+_credit_shards = LRUCache(maxsize=settings.CREDIT_SHARDS_CACHE_SIZE, ttl=settings.CREDIT_SHARDS_CACHE_SECONDS)
+
+
+def credit_shards(user_ids):
+    """
+    Quantidade de shards de crédito de cada usuário (LRU do processo, com TTL).
+    """
+
+    shards, missing = {}, []
+    for user_id in user_ids:
+        value = _credit_shards.get(user_id)
+        if value is None:
+            missing.append(user_id)
+        else:
+            shards[user_id] = value
+
+    if missing:
+        for user_id, value in CustomUser.objects.filter(pk__in=missing).values_list('pk', 'credit_shards'):
+            _credit_shards.set(user_id, value)
+            shards[user_id] = value
+    return shards
+
+
+def set_credit_shards(user_id, shards):
+    """
+    Define em quantos shards de saldo (e de agregado do extrato) os créditos do
+    usuário são espalhados. As linhas de shard que faltam são criadas antes de o
+    novo valor ser publicado; shards acima do novo valor continuam valendo (a
+    leitura soma todos). Outros processos enxergam a mudança em até
+    CREDIT_SHARDS_CACHE_SECONDS.
+    """
+
+    if not 1 <= shards <= settings.CREDIT_SHARDS_MAX:
+        raise ValueError(f"credit_shards deve estar entre 1 e {settings.CREDIT_SHARDS_MAX}.")
+
+    with db_transaction.atomic():
+        user = _lock_users(user_id).get(user_id)
+        if user is None:
+            return False
+
+        existing = set(BalanceSnapshot.objects.filter(user_id=user_id).values_list('shard', flat=True))
+        # Sem snapshot, a base do saldo é CustomUser.balance: ela passa para o shard 0.
+        BalanceSnapshot.objects.bulk_create([
+            BalanceSnapshot(user_id=user_id, shard=shard, balance=user.balance if not existing and shard == 0 else 0)
+            for shard in range(shards)
+            if shard not in existing
+        ])
+        CustomUser.objects.filter(pk=user_id).update(credit_shards=shards)
+
+    _credit_shards.delete(user_id)
+    return True
+
+
+def _lock_users(*user_ids):
+    """
+    Trava as linhas dos usuários sempre na mesma ordem (menor id primeiro),
+    evitando deadlock entre transferências cruzadas.
+
+    Todo lançamento do razão é gravado com a conta travada: a linha do usuário
+    ou, no crédito para uma conta com shards, a linha do shard sorteado (ver
+    _lock_accounts). Assim os saldos "antes/depois" das contas sem shards ficam
+    corretos mesmo com créditos simultâneos, e compact_ledger sabe que, com as
+    duas travas, não há lançamento do usuário pendente de commit.
+
+    O preço é que os créditos para uma conta sem shards se enfileiram na linha
+    dela, como antes do razão. Contas com muitos recebimentos (ex.: lojistas)
+    devem usar set_credit_shards, abrindo mão do saldo "antes/depois" exato.
+    """
+
+    users = CustomUser.objects.select_for_update().filter(
+        pk__in=user_ids
+    ).order_by('pk').only('id', 'balance', 'is_active')
+
+    return {user.pk: user for user in users}
+
+
+def _lock_credit_shards(shards):
+    """
+    Trava as linhas de shard sorteadas ({usuário: shard}) em ordem de pk, sem
+    travar a linha do usuário. Retorna {usuário: is_active} dos shards encontrados.
+    """
+
+    if not shards:
+        return {}
+
+    query = Q()
+    for user_id, shard in shards.items():
+        query |= Q(user_id=user_id, shard=shard)
+
+    rows = BalanceSnapshot.objects.select_for_update(of=('self',)).filter(
+        query
+    ).order_by('pk').values_list('user_id', 'user__is_active')
+
+    return dict(rows)
+
+
+def _lock_accounts(debited, credited):
+    """
+    Trava as contas de uma operação, sempre linhas de usuário antes de linhas de shard.
+
+    Contas debitadas e destinatários sem shards travam a linha do usuário.
+    Destinatários com credit_shards > 1 travam só um shard de saldo sorteado:
+    pagamentos simultâneos para a mesma conta não se enfileiram. Em troca, os
+    saldos "antes/depois" gravados para esses créditos não enxergam créditos
+    ainda não confirmados em outros shards. Débitos não precisam consolidar os
+    shards: créditos só aumentam o saldo, e a leitura sob a trava do usuário já
+    soma todos os shards confirmados.
+
+    Retorna ({usuário: is_active}, {destinatário com shards: shard sorteado}).
+    """
+
+    debited, credited = set(debited), set(credited)
+    shards = {
+        user_id: random.randrange(k)
+        for user_id, k in credit_shards(credited - debited).items()
+        if k > 1
+    }
+
+    active = {pk: user.is_active for pk, user in _lock_users(*(debited | credited) - set(shards)).items()}
+    active.update(_lock_credit_shards(shards))
+    return active, shards
+
+
+def lock_accounts(user_ids):
+    """
+    Trava as linhas dos usuários e todas as linhas de shard deles. Com as duas
+    travas nenhum lançamento desses usuários fica pendente de commit (usado pela
+    compactação do razão e pelo recálculo dos agregados).
+    """
+
+    users = _lock_users(*user_ids)
+    list(BalanceSnapshot.objects.select_for_update().filter(user_id__in=users).order_by('pk').values_list('pk'))
+    return users
+
+
+def ledger_balances(user_ids):
+    """
+    Calcula os saldos a partir do razão em uma única query: a soma dos snapshots
+    dos shards (ou CustomUser.balance, se ainda não houver snapshot) mais os
+    lançamentos de cada shard posteriores ao último lançamento consolidado dele.
+    """
+
+    snapshots = BalanceSnapshot.objects.filter(
+        user_id=OuterRef('pk')
+    ).values('user_id').annotate(total=Sum('balance')).values('total')
+    last_compacted = BalanceSnapshot.objects.filter(
+        user_id=OuterRef('user_id'), shard=OuterRef('shard')
+    ).values('last_entry_id')
+    deltas = LedgerEntry.objects.filter(
+        user_id=OuterRef('pk'),
+        id__gt=Coalesce(Subquery(last_compacted), Value(0)),
+    ).values('user_id').annotate(total=Sum('amount')).values('total')
+
+    users = CustomUser.objects.filter(pk__in=user_ids).annotate(
+        base=Coalesce(Subquery(snapshots), F('balance')),
+        delta=Coalesce(
+            Subquery(deltas),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    ).values_list('pk', 'base', 'delta')
+
+    return {pk: base + delta for pk, base, delta in users}
+
+
+def ledger_balance(user_id):
+    """
+    Saldo atual de um único usuário segundo o razão.
+    """
+
+    return ledger_balances([user_id]).get(user_id, Decimal('0.00'))
+
+
+def _post_entries(entries):
+    """
+    Grava os lançamentos do razão. Deve ser chamada com os usuários dos
+    lançamentos travados (ver _lock_users).
+    """
+
+    LedgerEntry.objects.bulk_create(entries)
+
+
+def adjust_balance(user_id, amount):
+    """
+    Ajuste manual de saldo (ex.: depósito feito pelo admin). Grava um lançamento
+    sem transação, com a linha do usuário travada; CustomUser.balance é só a
+    projeção e nunca é editado diretamente. Retorna o novo saldo.
+    """
+    if not amount:
+        raise ValidationError(_("O valor do ajuste não pode ser zero."))
+
+    with db_transaction.atomic():
+        if user_id not in _lock_users(user_id):
+            raise ValidationError(_("Usuário não encontrado."))
+
+        balance = ledger_balance(user_id) + amount
+        if balance < 0:
+            raise ValidationError(_("Saldo insuficiente para este ajuste."))
+
+        _post_entries([LedgerEntry(user_id=user_id, amount=amount)])
+        db_transaction.on_commit(lambda: mark_recent_write(user_id))
+
+    return balance
+
+
+def transfer_funds(sender_id, receiver_id, amount, comment=None, pending=None):
+    """
+    Executa uma transferência de forma atômica.
+
+    Trava remetente e destinatário (ver _lock_accounts), confere o saldo do razão
+    sob a trava e grava a transação com um par de lançamentos de débito/crédito. Se `pending`
+    for informado, a transação pendente é concluída em vez de criar outra
+    (ou marcada como FAILED quando o saldo não cobre o valor).
+    """
+    if amount <= 0:
+        raise ValidationError(_("O valor da transação deve ser positivo."))
+    if sender_id == receiver_id:
+        raise ValidationError(_("Não é possível transferir para si mesmo."))
+
+    with db_transaction.atomic():
+        if pending is not None and not Transaction.objects.select_for_update().filter(
+            pk=pending.pk, status=Transaction.StatusChoices.PENDING
+        ).exists():
+            # Já liquidada (ex.: por settle_pending_transactions) depois de carregada.
+            raise ValidationError(_("Apenas transações pendentes podem ser confirmadas."))
+
+        active, shards = _lock_accounts({sender_id}, {receiver_id})
+        if sender_id not in active or receiver_id not in active:
+            raise ValidationError(_("Usuário da transação não encontrado."))
+        # O serializer confere is_active pelo cache de CPFs, que pode estar velho.
+        if not active[receiver_id]:
+            raise ValidationError(_("A conta do destinatário está inativa."), code='receiver_inactive')
+        balances = ledger_balances([sender_id, receiver_id])
+
+        sender_balance_before = balances[sender_id]
+        receiver_balance_before = balances[receiver_id]
+
+        if sender_balance_before < amount:
+            if pending is not None:
+                pending.status = Transaction.StatusChoices.FAILED
+                pending.save(update_fields=["status"])
+                return pending
+            raise ValidationError(_("Saldo insuficiente para esta transação."))
+
+        balances = {
+            'sender_balance_before': sender_balance_before,
+            'sender_balance_after': sender_balance_before - amount,
+            'receiver_balance_before': receiver_balance_before,
+            'receiver_balance_after': receiver_balance_before + amount,
+            'status': Transaction.StatusChoices.COMPLETED,
+        }
+
+        if pending is None:
+            transaction = Transaction.objects.create(
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                amount=amount,
+                comment=comment,
+                **balances,
+            )
+        else:
+            transaction = pending
+            for field, value in balances.items():
+                setattr(transaction, field, value)
+            transaction.save(update_fields=list(balances))
+
+        _post_entries([
+            LedgerEntry(user_id=sender_id, transaction=transaction, amount=-amount),
+            LedgerEntry(user_id=receiver_id, transaction=transaction, amount=amount, shard=shards.get(receiver_id, 0)),
+        ])
+        apply_completed_transactions([transaction], credit_shards=shards)
+        db_transaction.on_commit(lambda: mark_recent_write(sender_id, receiver_id))
+        return transaction
+
+
+def create_pending_transfer(sender_id, receiver_id, amount, comment=None):
+    """
+    Modo de liquidação diferida: só grava a transação PENDING, sem travar
+    nenhuma conta. settle_pending_transactions a conclui (ou marca FAILED) depois.
+    """
+    if amount <= 0:
+        raise ValidationError(_("O valor da transação deve ser positivo."))
+    if sender_id == receiver_id:
+        raise ValidationError(_("Não é possível transferir para si mesmo."))
+
+    return Transaction.objects.create(
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        amount=amount,
+        comment=comment,
+        status=Transaction.StatusChoices.PENDING,
+    )
+
+
+def settle_pending_transactions(batch_size=500):
+    """
+    Liquida um lote de transações PENDING, na ordem de criação.
+
+    Reivindica as linhas com select_for_update(skip_locked=True), então vários
+    liquidantes rodam em paralelo sem pegar as mesmas transações. Trava os
+    participantes do lote (ver _lock_accounts), confere saldos e destinatários
+    (removidos ou desativados fazem a transação falhar) transação a transação
+    e grava, por par de contas, um único par de lançamentos com o valor líquido
+    do lote. Status e saldos das transações vão em um bulk_update.
+
+    Retorna (concluídas, falhas).
+    """
+
+    with db_transaction.atomic():
+        batch = list(
+            Transaction.objects.select_for_update(skip_locked=True).filter(
+                status=Transaction.StatusChoices.PENDING
+            ).order_by('timestamp', 'id')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        senders = {transaction.sender_id for transaction in batch}
+        participants = senders | {transaction.receiver_id for transaction in batch}
+        active, shards = _lock_accounts(senders, participants - senders)
+        balances = ledger_balances(participants)
+
+        completed, failed, pairs = [], [], {}
+        for transaction in batch:
+            sender_id, receiver_id, amount = transaction.sender_id, transaction.receiver_id, transaction.amount
+            if not active.get(receiver_id) or balances.get(sender_id, 0) < amount:
+                transaction.status = Transaction.StatusChoices.FAILED
+                failed.append(transaction)
+                continue
+
+            transaction.sender_balance_before = balances[sender_id]
+            transaction.sender_balance_after = balances[sender_id] - amount
+            transaction.receiver_balance_before = balances[receiver_id]
+            transaction.receiver_balance_after = balances[receiver_id] + amount
+            transaction.status = Transaction.StatusChoices.COMPLETED
+            balances[sender_id] -= amount
+            balances[receiver_id] += amount
+
+            completed.append(transaction)
+            pairs.setdefault((min(sender_id, receiver_id), max(sender_id, receiver_id)), []).append(transaction)
+
+        entries = []
+        for (low, high), transactions in pairs.items():
+            # Fluxo líquido de `low` para `high` no lote; um lançamento líquido
+            # só aponta para a transação quando ela é a única do par. Contas com
+            # shard sorteado só recebem no lote, então o lançamento delas é sempre crédito.
+            flow = sum(t.amount if t.sender_id == low else -t.amount for t in transactions)
+            if flow:
+                link = transactions[0] if len(transactions) == 1 else None
+                entries.append(LedgerEntry(user_id=low, transaction=link, amount=-flow, shard=shards.get(low, 0)))
+                entries.append(LedgerEntry(user_id=high, transaction=link, amount=flow, shard=shards.get(high, 0)))
+
+        Transaction.objects.bulk_update(batch, [
+            'status',
+            'sender_balance_before', 'sender_balance_after',
+            'receiver_balance_before', 'receiver_balance_after',
+        ])
+        _post_entries(entries)
+        apply_completed_transactions(completed, credit_shards=shards)
+
+        # bulk_update não dispara post_save: invalida o cache dos participantes aqui.
+        touched = participants
+
+        def after_commit():
+            mark_recent_write(*touched)
+            invalidate_user_transactions(*touched)
+
+        db_transaction.on_commit(after_commit)
+
+    return len(completed), len(failed)
+
+
+def _resolve_cpfs(cpfs, chunk_size=900):
+    """
+    Resolve CPFs para ids com queries IN (em blocos, pelo limite de parâmetros do banco).
+    """
+
+    cpfs = list(cpfs)
+    resolved = {}
+    for start in range(0, len(cpfs), chunk_size):
+        resolved.update(
+            CustomUser.objects.filter(cpf__in=cpfs[start:start + chunk_size]).values_list('cpf', 'pk')
+        )
+    return resolved
+
+
+def transfer_batch(sender_id, items, all_or_nothing=True):
+    """
+    Executa várias transferências do mesmo remetente (ex.: folha de pagamento).
+
+    Resolve todos os CPFs de uma vez, trava remetente e destinatários e confere o saldo uma
+    única vez; destinatários removidos ou desativados entre a resolução e a trava
+    são recusados item a item, e grava transações e lançamentos com bulk_create. Em modo
+    tudo-ou-nada, qualquer item inválido faz o lote inteiro ser recusado;
+    no modo best-effort os itens válidos são aplicados em ordem enquanto houver saldo.
+
+    Retorna a lista de resultados por item.
+    """
+
+    receivers = _resolve_cpfs({item['receiver_cpf'] for item in items})
+
+    with db_transaction.atomic():
+        active, shards = _lock_accounts({sender_id}, set(receivers.values()))
+        if sender_id not in active:
+            raise ValidationError(_("Usuário da transação não encontrado."))
+        balances = ledger_balances([sender_id, *receivers.values()])
+
+        results, transactions, entries = [], [], []
+        for index, item in enumerate(items):
+            receiver_id = receivers.get(item['receiver_cpf'])
+            amount = item['amount']
+            result = {'index': index, 'receiver_cpf': item['receiver_cpf']}
+            results.append(result)
+
+            if receiver_id is None or receiver_id not in active:
+                error = _("Usuário com este CPF não encontrado.")
+            elif not active[receiver_id]:
+                error = _("A conta do destinatário está inativa.")
+            elif receiver_id == sender_id:
+                error = _("Não é possível transferir para si mesmo.")
+            elif amount <= 0:
+                error = _("O valor da transação deve ser positivo.")
+            elif balances[sender_id] < amount:
+                error = _("Saldo insuficiente para esta transação.")
+            else:
+                error = None
+
+            if error is not None:
+                result.update(status=Transaction.StatusChoices.FAILED, error=str(error))
+                continue
+
+            transaction = Transaction(
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                amount=amount,
+                comment=item.get('comment'),
+                sender_balance_before=balances[sender_id],
+                sender_balance_after=balances[sender_id] - amount,
+                receiver_balance_before=balances[receiver_id],
+                receiver_balance_after=balances[receiver_id] + amount,
+                status=Transaction.StatusChoices.COMPLETED,
+            )
+            balances[sender_id] -= amount
+            balances[receiver_id] += amount
+
+            transactions.append(transaction)
+            entries.append(LedgerEntry(user_id=sender_id, transaction=transaction, amount=-amount))
+            entries.append(
+                LedgerEntry(user_id=receiver_id, transaction=transaction, amount=amount, shard=shards.get(receiver_id, 0))
+            )
+            result.update(status=Transaction.StatusChoices.COMPLETED, transaction_id=transaction.id)
+
+        if all_or_nothing and len(transactions) < len(items):
+            for result in results:
+                if result['status'] == Transaction.StatusChoices.COMPLETED:
+                    result.update(status='REJECTED')
+                    del result['transaction_id']
+            return results
+
+        Transaction.objects.bulk_create(transactions)
+        _post_entries(entries)
+        apply_completed_transactions(transactions, credit_shards=shards)
+        # bulk_create não dispara post_save: invalida o cache dos participantes aqui.
+        touched = {sender_id, *(transaction.receiver_id for transaction in transactions)}
+
+        def after_commit():
+            mark_recent_write(*touched)
+            invalidate_user_transactions(*touched)
+
+        db_transaction.on_commit(after_commit)
+
+    return results
+
+
+def compact_ledger(batch_size=1000):
+    """
+    Consolida os lançamentos em novos snapshots (um por shard) e atualiza a
+    projeção CustomUser.balance com a soma dos shards.
+
+    Os totais são recalculados depois de travar as contas do lote (lock_accounts):
+    nessa hora todo lançamento delas já confirmou, e avançar last_entry_id até o
+    maior id não pula nenhum lançamento que ainda iria confirmar com id menor.
+    """
+
+    last_compacted = Coalesce(
+        Subquery(
+            BalanceSnapshot.objects.filter(
+                user_id=OuterRef('user_id'), shard=OuterRef('shard')
+            ).values('last_entry_id')
+        ),
+        Value(0),
+    )
+    entries = LedgerEntry.objects.filter(id__gt=last_compacted)
+
+    compacted = 0
+    candidates = sorted(entries.values_list('user_id', flat=True).distinct())
+    for start in range(0, len(candidates), batch_size):
+        with db_transaction.atomic():
+            projections = {
+                pk: user.balance for pk, user in lock_accounts(candidates[start:start + batch_size]).items()
+            }
+            snapshots = {}
+            for snapshot in BalanceSnapshot.objects.filter(user_id__in=projections):
+                snapshots.setdefault(snapshot.user_id, {})[snapshot.shard] = snapshot
+
+            pending = entries.filter(user_id__in=projections).values('user_id', 'shard').annotate(
+                total=Sum('amount'), last=Max('id')
+            ).order_by('user_id', 'shard')
+
+            to_create, to_update = [], []
+            for row in pending:
+                shards = snapshots.setdefault(row['user_id'], {})
+                if not shards:
+                    # Primeiro snapshot da conta: a base é o saldo em CustomUser.balance.
+                    shards[0] = BalanceSnapshot(user_id=row['user_id'], shard=0, balance=projections[row['user_id']])
+                    to_create.append(shards[0])
+                snapshot = shards.get(row['shard'])
+                if snapshot is None:
+                    snapshot = shards[row['shard']] = BalanceSnapshot(user_id=row['user_id'], shard=row['shard'])
+                    to_create.append(snapshot)
+                elif snapshot.pk is not None:
+                    to_update.append(snapshot)
+                snapshot.balance += row['total']
+                snapshot.last_entry_id = row['last']
+                snapshot.updated_at = timezone.now()
+
+            users = [
+                CustomUser(pk=user_id, balance=sum(snapshot.balance for snapshot in snapshots[user_id].values()))
+                for user_id in {snapshot.user_id for snapshot in to_create + to_update}
+            ]
+            BalanceSnapshot.objects.bulk_create(to_create)
+            BalanceSnapshot.objects.bulk_update(to_update, ['balance', 'last_entry_id', 'updated_at'])
+            CustomUser.objects.bulk_update(users, ['balance'])
+            compacted += len(users)
+
+    return compacted
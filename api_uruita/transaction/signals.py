@@ -0,0 +1,18 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from transaction.cache import invalidate_user_transactions
+from transaction.models import Transaction
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_cached_transactions(sender, instance, **kwargs):
+    """
+    Descarta as transações em cache dos participantes quando uma transação
+    é criada, alterada (ex.: PENDING -> COMPLETED) ou removida.
+    Os caminhos com bulk_create/update não disparam sinais e chamam o hook direto.
+    """
+
+    db_transaction.on_commit(lambda: invalidate_user_transactions(instance.sender_id, instance.receiver_id))
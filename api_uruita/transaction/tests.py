@@ -1,3 +1,440 @@
-from django.test import TestCase
+import tempfile
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api_uruita.checks import deferred_settlement_requires_shared_cache, replica_requires_shared_cache
+from api_uruita.db_routers import PrimaryReplicaRouter, mark_recent_write, read_db_for, reading_from
+from api_uruita.renderers import ORJSONRenderer
+from extrato.models import StatementAggregate
+from extrato.services import rebuild_aggregates
+from transaction.cache import invalidate_user_transactions
+from transaction.idempotency import _replays, run_idempotent
+from transaction.models import BalanceSnapshot, IdempotencyKey, LedgerEntry, Transaction
+from transaction.services import (
+    _lock_users,
+    compact_ledger,
+    ledger_balance,
+    ledger_balances,
+    set_credit_shards,
+    settle_pending_transactions,
+    transfer_batch,
+    transfer_funds,
+)
+from users.cache import resolve_cpf
+from users.models import CustomUser
+from users.tokens import CachedRefreshToken
+
+
+class ORJSONRendererTests(TestCase):
+    def test_same_output_as_json_renderer(self):
+        data = {
+            'amount': Decimal('10.50'),
+            'timestamp': datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+            'errors': {0: {'amount': ['inválido']}},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class TransactionBatchViewTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='remetente', email='a@a.com', password='x', balance=Decimal('100'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_invalid_item_returns_400(self):
+        response = self.client.post(
+            '/api/v1/transaction/batch/',
+            {'items': [{'receiver_cpf': '111.444.777-35', 'amount': 'abc'}]},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.json()['items']['0'])
+
+
+class RunIdempotentTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(cpf='529.982.247-25', username='remetente', email='a@a.com', password='x')
+
+    def test_expired_unpurged_key_is_reused(self):
+        run_idempotent(self.user.pk, 'k1', {'n': 1}, lambda: (201, {'n': 1}))
+        IdempotencyKey.objects.update(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        _replays.clear()
+
+        status, body, replayed = run_idempotent(self.user.pk, 'k1', {'n': 2}, lambda: (201, {'n': 2}))
+
+        self.assertEqual((status, body, replayed), (201, {'n': 2}, False))
+        self.assertEqual(IdempotencyKey.objects.get().response_body, {'n': 2})
+
+
+def _file_cache(directory):
+    return {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+
+
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """
+    Primário e réplica como dois arquivos SQLite; o cache em arquivo faz o papel
+    do cache compartilhado entre workers.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        databases = {
+            'default': {**settings.DATABASES['default'], 'NAME': f'{directory.name}/primary.sqlite3'},
+            'replica': {**settings.DATABASES['default'], 'NAME': f'{directory.name}/replica.sqlite3'},
+        }
+        patcher = mock.patch.dict(settings.DATABASES, databases)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache_dir = directory.name + '/cache'
+
+    def test_reads_replica_until_user_writes(self):
+        with override_settings(CACHES=_file_cache(self.cache_dir)):
+            self.assertEqual(read_db_for(1), 'replica')
+            mark_recent_write(1)
+            self.assertEqual(read_db_for(1), 'default')
+            self.assertEqual(read_db_for(2), 'replica')
+
+    def test_process_local_cache_keeps_reads_on_primary(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(read_db_for(1), 'default')
+            self.assertEqual(len(replica_requires_shared_cache(None)), 1)
+
+    def test_router_follows_reading_from(self):
+        router = PrimaryReplicaRouter()
+        with reading_from('replica'):
+            self.assertEqual(router.db_for_read(CustomUser), 'replica')
+            self.assertEqual(router.db_for_write(CustomUser), 'default')
+        self.assertEqual(router.db_for_read(CustomUser), 'default')
+
+
+class TransactionConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(cpf='529.982.247-25', username='remetente', email='a@a.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+
+    def test_no_etag_without_shared_cache(self):
+        response = self.client.get('/api/v1/transaction/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_not_modified_until_invalidated(self):
+        with override_settings(CACHES=_file_cache(self.cache_dir)):
+            etag = self.client.get('/api/v1/transaction/')['ETag']
+            self.assertEqual(self.client.get('/api/v1/transaction/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            invalidate_user_transactions(self.user.pk)
+
+            response = self.client.get('/api/v1/transaction/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+
+class TransactionDetailCacheTests(TestCase):
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(cpf='529.982.247-25', username='remetente', email='a@a.com', password='x')
+        self.receiver = CustomUser.objects.create_user(cpf='111.444.777-35', username='destino', email='b@b.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sender)
+
+    def test_settlement_in_other_process_is_visible(self):
+        pending = Transaction.objects.create(sender=self.sender, receiver=self.receiver, amount=Decimal('1.00'))
+        url = f'/api/v1/transaction/{pending.pk}/'
+        self.assertEqual(self.client.get(url).json()['status'], 'PENDING')
+
+        # Outro processo liquida sem passar pelos sinais deste.
+        Transaction.objects.filter(pk=pending.pk).update(status=Transaction.StatusChoices.COMPLETED)
+
+        self.assertEqual(self.client.get(url).json()['status'], 'COMPLETED')
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.payers = [
+            CustomUser.objects.create_user(cpf=cpf, username=f'pagador{n}', email=f'p{n}@a.com', password='x', balance=Decimal('100'))
+            for n, cpf in enumerate(('529.982.247-25', '935.411.347-80'))
+        ]
+        self.merchant = CustomUser.objects.create_user(cpf='111.444.777-35', username='lojista', email='l@a.com', password='x')
+
+    def test_receiver_snapshots_chain(self):
+        first = transfer_funds(self.payers[0].pk, self.merchant.pk, Decimal('10.00'))
+        second = transfer_funds(self.payers[1].pk, self.merchant.pk, Decimal('5.00'))
+
+        self.assertEqual((first.receiver_balance_before, first.receiver_balance_after), (Decimal('0'), Decimal('10.00')))
+        self.assertEqual(second.receiver_balance_before, first.receiver_balance_after)
+        self.assertEqual(second.receiver_balance_after, Decimal('15.00'))
+
+    def test_compaction_keeps_balances(self):
+        transfer_funds(self.payers[0].pk, self.merchant.pk, Decimal('10.00'))
+        before = ledger_balances([user.pk for user in (*self.payers, self.merchant)])
+
+        self.assertEqual(compact_ledger(), 2)
+        transfer_funds(self.payers[1].pk, self.merchant.pk, Decimal('1.00'))
+
+        after = ledger_balances(list(before))
+        self.assertEqual(after[self.merchant.pk], before[self.merchant.pk] + 1)
+        self.assertEqual(CustomUser.objects.get(pk=self.merchant.pk).balance, Decimal('10.00'))
+        self.assertEqual(compact_ledger(), 2)
+        self.assertEqual(compact_ledger(), 0)
+
+    def test_rebuild_matches_incremental_aggregates(self):
+        transfer_funds(self.payers[0].pk, self.merchant.pk, Decimal('10.00'))
+        transfer_funds(self.payers[1].pk, self.merchant.pk, Decimal('5.00'))
+        fields = ('user_id', 'period', 'period_start', 'total_in', 'total_out', 'transaction_count', 'closing_balance')
+        incremental = sorted(StatementAggregate.objects.values_list(*fields))
+
+        self.assertEqual(rebuild_aggregates(), len(incremental))
+        self.assertEqual(sorted(StatementAggregate.objects.values_list(*fields)), incremental)
+
+
+class TransferBatchTests(TestCase):
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='remetente', email='a@a.com', password='x', balance=Decimal('100')
+        )
+        self.receiver = CustomUser.objects.create_user(cpf='111.444.777-35', username='destino', email='b@b.com', password='x')
+
+    def test_rejects_inactive_and_vanished_receivers(self):
+        inactive = CustomUser.objects.create_user(
+            cpf='935.411.347-80', username='inativo', email='c@c.com', password='x', is_active=False
+        )
+        items = [
+            {'receiver_cpf': self.receiver.cpf, 'amount': Decimal('10')},
+            {'receiver_cpf': inactive.cpf, 'amount': Decimal('10')},
+            {'receiver_cpf': '000.000.001-91', 'amount': Decimal('10')},
+        ]
+        resolved = {self.receiver.cpf: self.receiver.pk, inactive.cpf: inactive.pk, '000.000.001-91': 999999}
+
+        with mock.patch('transaction.services._resolve_cpfs', return_value=resolved):
+            results = transfer_batch(self.sender.pk, items, all_or_nothing=False)
+
+        self.assertEqual(
+            [result['status'] for result in results],
+            [Transaction.StatusChoices.COMPLETED, Transaction.StatusChoices.FAILED, Transaction.StatusChoices.FAILED],
+        )
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class DeferredSettlementTests(SimpleTestCase):
+    def test_requires_shared_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(TRANSACTION_SETTLEMENT_MODE='deferred', CACHES=locmem):
+            self.assertEqual(len(deferred_settlement_requires_shared_cache(None)), 1)
+            with self.assertRaises(CommandError):
+                call_command('settle_transactions')
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(TRANSACTION_SETTLEMENT_MODE='deferred', CACHES=_file_cache(directory)):
+                self.assertEqual(deferred_settlement_requires_shared_cache(None), [])
+
+
+class CreditShardsTests(TestCase):
+    def setUp(self):
+        self.payers = [
+            CustomUser.objects.create_user(cpf=cpf, username=f'pagador{n}', email=f'p{n}@a.com', password='x', balance=Decimal('100'))
+            for n, cpf in enumerate(('529.982.247-25', '935.411.347-80'))
+        ]
+        self.merchant = CustomUser.objects.create_user(
+            cpf='111.444.777-35', username='lojista', email='l@a.com', password='x', balance=Decimal('7')
+        )
+        set_credit_shards(self.merchant.pk, 4)
+
+    def test_shard_rows_carry_the_base_balance(self):
+        shards = dict(BalanceSnapshot.objects.filter(user=self.merchant).values_list('shard', 'balance'))
+        self.assertEqual(shards, {0: Decimal('7'), 1: 0, 2: 0, 3: 0})
+        self.assertEqual(ledger_balance(self.merchant.pk), Decimal('7'))
+
+    def test_credit_locks_a_shard_instead_of_the_receiver(self):
+        with mock.patch('transaction.services._lock_users', wraps=_lock_users) as lock_users:
+            for n in range(8):
+                transfer_funds(self.payers[n % 2].pk, self.merchant.pk, Decimal('1.00'))
+
+        self.assertTrue(all(self.merchant.pk not in call.args for call in lock_users.call_args_list))
+        self.assertEqual(ledger_balance(self.merchant.pk), Decimal('15.00'))
+        self.assertLessEqual(set(LedgerEntry.objects.filter(user=self.merchant).values_list('shard', flat=True)), {0, 1, 2, 3})
+
+    def test_debit_and_compaction_sum_the_shards(self):
+        for n in range(6):
+            transfer_funds(self.payers[n % 2].pk, self.merchant.pk, Decimal('1.00'))
+        transfer_funds(self.merchant.pk, self.payers[0].pk, Decimal('13.00'))
+
+        with self.assertRaises(ValidationError):
+            transfer_funds(self.merchant.pk, self.payers[0].pk, Decimal('0.01'))
+
+        compact_ledger()
+        self.assertEqual(ledger_balance(self.merchant.pk), Decimal('0.00'))
+        self.assertEqual(CustomUser.objects.get(pk=self.merchant.pk).balance, Decimal('0.00'))
+        self.assertEqual(BalanceSnapshot.objects.filter(user=self.merchant).count(), 4)
+
+        transfer_funds(self.payers[1].pk, self.merchant.pk, Decimal('2.00'))
+        self.assertEqual(ledger_balance(self.merchant.pk), Decimal('2.00'))
+
+    def test_batch_credits_a_sharded_receiver(self):
+        items = [{'receiver_cpf': self.merchant.cpf, 'amount': Decimal('3.00')} for _ in range(3)]
+        results = transfer_batch(self.payers[0].pk, items)
+
+        self.assertEqual({result['status'] for result in results}, {Transaction.StatusChoices.COMPLETED})
+        self.assertEqual(ledger_balance(self.merchant.pk), Decimal('16.00'))
+        self.assertEqual(compact_ledger(), 2)
+        self.assertEqual(CustomUser.objects.get(pk=self.merchant.pk).balance, Decimal('16.00'))
+
+
+class InactiveReceiverTests(TestCase):
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='remetente', email='a@a.com', password='x', balance=Decimal('100')
+        )
+        self.receiver = CustomUser.objects.create_user(cpf='111.444.777-35', username='destino', email='b@b.com', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.sender)
+
+    def test_stale_cpf_cache_is_checked_under_the_lock(self):
+        self.assertEqual(resolve_cpf(self.receiver.cpf), (self.receiver.pk, True))
+        # Desativada por outro processo: o LRU deste ainda diz que a conta está ativa.
+        CustomUser.objects.filter(pk=self.receiver.pk).update(is_active=False)
+
+        response = self.client.post(
+            '/api/v1/transaction/', {'receiver_cpf': self.receiver.cpf, 'amount': '1.00'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('receiver_cpf', response.json())
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(resolve_cpf(self.receiver.cpf), (self.receiver.pk, False))
+
+    def test_settlement_fails_for_inactive_receiver(self):
+        Transaction.objects.create(sender=self.sender, receiver=self.receiver, amount=Decimal('1.00'))
+        CustomUser.objects.filter(pk=self.receiver.pk).update(is_active=False)
+
+        self.assertEqual(settle_pending_transactions(), (0, 1))
+
+
+class TransactionPaginationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='remetente', email='a@a.com', password='x', balance=Decimal('100')
+        )
+        self.other = CustomUser.objects.create_user(
+            cpf='111.444.777-35', username='destino', email='b@b.com', password='x', balance=Decimal('100')
+        )
+        for n in range(5):
+            sender, receiver = (self.user, self.other) if n % 2 else (self.other, self.user)
+            transfer_funds(sender.pk, receiver.pk, Decimal(n + 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_walks_both_branches_with_a_limit_per_branch(self):
+        seen, url = [], '/api/v1/transaction/?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                body = self.client.get(url).json()
+            seen += [row['amount'] for row in body['results']]
+            url = body['next']
+
+            page_sql = next(query['sql'] for query in queries.captured_queries if 'UNION ALL' in query['sql'])
+            self.assertEqual(page_sql.count('LIMIT'), 3)
+
+        self.assertEqual(seen, ['5.00', '4.00', '3.00', '2.00', '1.00'])
+
+
+class AsyncViewParityTests(TestCase):
+    """
+    As views async re-implementam status, corpos de erro, idempotência e 304
+    das views DRF: cada caso roda nos dois caminhos e compara as respostas.
+    """
+
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='remetente', email='a@a.com', password='x', balance=Decimal('100'),
+        )
+        self.receiver = CustomUser.objects.create_user(cpf='111.444.777-35', username='destino', email='b@b.com', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {CachedRefreshToken.for_user(self.sender).access_token}')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = override_settings(CACHES=_file_cache(directory.name))
+        self.cache.enable()
+        self.addCleanup(self.cache.disable)
+
+    def both(self, method, path, data=None, **extra):
+        responses = [
+            getattr(self.client, method)(f'/api/v1/{prefix}transaction/{path}', data, format='json', **extra)
+            for prefix in ('', 'async/')
+        ]
+        self.assertEqual(*(response.status_code for response in responses))
+        return responses
+
+    def assertSame(self, method, path, data, status_code, **extra):
+        sync, async_ = self.both(method, path, data, **extra)
+        self.assertEqual(sync.status_code, status_code)
+        self.assertEqual(sync.json(), async_.json())
+        return sync
+
+    def transfer(self, amount='1.00'):
+        return {'receiver_cpf': self.receiver.cpf, 'amount': amount}
+
+    def test_authentication(self):
+        for credentials in ({}, {'HTTP_AUTHORIZATION': 'Bearer x'}):
+            self.client.credentials(**credentials)
+            sync, async_ = self.both('get', '')
+            self.assertEqual(sync.status_code, 401)
+            self.assertEqual(sync.json(), async_.json())
+            self.assertEqual(sync['WWW-Authenticate'], async_['WWW-Authenticate'])
+
+    def test_create_errors(self):
+        self.assertSame('post', '', {'receiver_cpf': self.receiver.cpf, 'amount': '-1'}, 400)
+        self.assertSame('post', '', {'receiver_cpf': '123.456.789-09', 'amount': '1.00'}, 400)
+        self.assertSame('post', '', self.transfer('1000.00'), 400)
+        self.assertSame('post', '', self.transfer(), 400, HTTP_IDEMPOTENCY_KEY='x' * 256)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_create_and_idempotency(self):
+        sync, async_ = self.both('post', '', self.transfer())
+        self.assertEqual(sync.status_code, 201)
+        self.assertEqual(sync.json().keys(), async_.json().keys())
+
+        first = self.client.post('/api/v1/transaction/', self.transfer(), format='json', HTTP_IDEMPOTENCY_KEY='k')
+        sync, async_ = self.both('post', '', self.transfer(), HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(sync.status_code, 201)
+        self.assertEqual(first.json(), sync.json())
+        self.assertEqual(sync.json(), async_.json())
+        self.assertEqual((sync['Idempotent-Replayed'], async_['Idempotent-Replayed']), ('true', 'true'))
+
+        self.assertSame('post', '', self.transfer('2.00'), 422, HTTP_IDEMPOTENCY_KEY='k')
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_list_and_detail(self):
+        transaction = transfer_funds(self.sender.pk, self.receiver.pk, Decimal('1.00'))
+
+        for path in ('', f'{transaction.pk}/'):
+            sync = self.assertSame('get', path, None, 200)
+            etag = sync['ETag']
+            for response in self.both('get', path):
+                self.assertEqual(response['ETag'], etag)
+                self.assertIn('Authorization', response['Vary'])
+
+            for response in self.both('get', path, HTTP_IF_NONE_MATCH=etag):
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+        other = transfer_funds(self.receiver.pk, self.sender.pk, Decimal('0.50'))
+        Transaction.objects.filter(pk=other.pk).update(sender=self.receiver, receiver=self.receiver)
+        self.assertSame('get', f'{other.pk}/', None, 404)
@@ -1,8 +1,9 @@
 from django.urls import path
 
-from transaction.views import TransactionDetailView, TransactionViewSet
+from transaction.views import TransactionBatchView, TransactionDetailView, TransactionViewSet
 
 urlpatterns = [
     path('', TransactionViewSet.as_view(), name='transaction-create'),
+    path('batch/', TransactionBatchView.as_view(), name='transaction-batch'),
     path('<uuid:transaction_id>/', TransactionDetailView.as_view(), name='transaction-detail'),
 ]
@@ -2,14 +2,35 @@ from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from api_uruita.db_routers import ReplicaReadMixin
+from api_uruita.metrics import serializer_timer
 from .models import Transaction
-from .serializers import TransactionSerializer
+from .cache import (
+    conditional_response,
+    get_recent_transaction,
+    not_modified,
+    remember_transaction,
+    transactions_etag,
+    transactions_page_key,
+)
+from .serializers import (
+    TRANSACTION_ROW_FIELDS,
+    TransactionBatchSerializer,
+    TransactionReadSerializer,
+    TransactionSerializer,
+    serialize_transaction_rows,
+)
+from .services import transfer_batch
+from .pagination import TransactionCursorPagination
+from .idempotency import IdempotencyKeyReused, run_idempotent
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
 from django.db.models import Q
 
 
-class TransactionViewSet(generics.ListCreateAPIView):
+class TransactionViewSet(ReplicaReadMixin, generics.ListCreateAPIView):
     """
     Endpoint para listar e criar transações.
     ViewSet para transações, permitindo transferências por CPF.
@@ -18,19 +39,100 @@ class TransactionViewSet(generics.ListCreateAPIView):
 
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionCursorPagination
 
     def get_queryset(self):
         """
         Retorna apenas transações onde o usuário é o remetente ou o destinatário.
-        Usa select_related para otimizar queries ao banco.
         """
 
         user = self.request.user
 
         return Transaction.objects.filter(
-            Q(sender=user) | Q(receiver=user)
-        ).select_related("sender", "receiver"
-        ).order_by('-timestamp')
+            Q(sender_id=user.pk) | Q(receiver_id=user.pk)
+        ).order_by('-timestamp', '-id')
+
+    def get_branches(self):
+        """
+        Divide o OR de get_queryset em dois ramos, cada um coberto pelo índice
+        (sender|receiver, timestamp, id), para a paginação juntar com UNION.
+        """
+
+        user = self.request.user
+
+        return [
+            Transaction.objects.filter(sender_id=user.pk),
+            Transaction.objects.filter(receiver_id=user.pk),
+        ]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Caminho rápido de leitura: os ramos trazem tuplas (values_list) e a página
+        é formatada por serialize_transaction_rows, sem instanciar modelos.
+
+        O ETag é a versão das transações do usuário: no polling sem mudanças a
+        resposta é 304 com uma única leitura de cache. A página montada fica em
+        cache por (usuário, versão, URL); a versão é lida antes da consulta,
+        então uma escrita concorrente nunca deixa dados antigos na versão nova.
+        Sem cache compartilhado não há ETag nem cache de páginas.
+        """
+
+        user_id = request.user.pk
+        etag = transactions_etag(user_id)
+        if not_modified(request, etag):
+            return conditional_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        page_key = transactions_page_key(user_id, etag, request)
+        data = cache.get(page_key) if page_key else None
+        if data is None:
+            branches = [branch.values_list(*TRANSACTION_ROW_FIELDS, named=True) for branch in self.get_branches()]
+            page = self.paginator.paginate_branches(branches, request, view=self)
+            with serializer_timer():
+                data = self.paginator.get_paginated_data(serialize_transaction_rows(page))
+            if page_key:
+                cache.set(page_key, data, settings.TRANSACTION_PAGE_CACHE_SECONDS)
+
+        return conditional_response(Response(data), etag)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Cria a transação respeitando o header Idempotency-Key: retentativas com
+        a mesma chave recebem a resposta gravada, sem executar a transferência de novo.
+        """
+
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return self.create_transaction(request)
+        if len(key) > 255:
+            return Response({"detail": "Idempotency-Key muito longa."}, status=status.HTTP_400_BAD_REQUEST)
+
+        def create():
+            response = self.create_transaction(request)
+            return response.status_code, response.data
+
+        try:
+            status_code, body, replayed = run_idempotent(request.user.pk, key, request.data, create)
+        except IdempotencyKeyReused:
+            return Response(
+                {"detail": "Idempotency-Key já utilizada com outro corpo de requisição."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        headers = {'Idempotent-Replayed': 'true'} if replayed else None
+        return Response(body, status=status_code, headers=headers)
+
+    def create_transaction(self, request):
+        """
+        Valida e cria a transação: 201 quando concluída na hora, 202 quando fica
+        PENDING aguardando a liquidação diferida.
+        """
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+
+        accepted = serializer.instance.status == Transaction.StatusChoices.PENDING
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED if accepted else status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
         """
@@ -39,7 +141,35 @@ class TransactionViewSet(generics.ListCreateAPIView):
         serializer.save(sender=self.request.user)
 
 
-class TransactionDetailView(APIView):
+class TransactionBatchView(APIView):
+    """
+    Endpoint para transferências em lote (ex.: folha de pagamento).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = TransactionBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        mode = serializer.validated_data['mode']
+        try:
+            results = transfer_batch(
+                request.user.pk,
+                serializer.validated_data['items'],
+                all_or_nothing=mode == TransactionBatchSerializer.ModeChoices.ALL_OR_NOTHING,
+            )
+        except ValidationError as e:
+            return Response({"detail": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+
+        completed = sum(1 for result in results if result['status'] == Transaction.StatusChoices.COMPLETED)
+        return Response(
+            {"mode": mode, "completed": completed, "failed": len(results) - completed, "results": results},
+            status=status.HTTP_201_CREATED if completed else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class TransactionDetailView(ReplicaReadMixin, APIView):
     """
     View para visualizar uma transação específica do usuário autenticado.
     """
@@ -49,11 +179,26 @@ class TransactionDetailView(APIView):
     def get(self, request, transaction_id, *args, **kwargs):
         """
         Exibe uma transação específica do usuário autenticado.
+
+        A participação do usuário faz parte da própria query (pk + remetente ou
+        destinatário), então transações de terceiros respondem 404 sem carregar nada.
+        Clientes costumam consultar repetidamente a transferência recém-criada, por
+        isso o resultado fica no cache de recentes do usuário. O ETag é a versão
+        das transações do usuário, como na listagem.
         """
-        transaction = get_object_or_404(Transaction, id=transaction_id)
-        
-        if transaction.sender != request.user and transaction.receiver != request.user:
-            return Response({"detail": "Você não tem permissão para visualizar essa transação."}, status=status.HTTP_403_FORBIDDEN)
-        
-        serializer = TransactionSerializer(transaction)
-        return Response(serializer.data)
+
+        user_id = request.user.pk
+        etag = transactions_etag(user_id)
+        if not_modified(request, etag):
+            return conditional_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        data = get_recent_transaction(user_id, transaction_id)
+        if data is None:
+            transaction = get_object_or_404(
+                Transaction.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)),
+                id=transaction_id,
+            )
+            data = TransactionReadSerializer(transaction).data
+            remember_transaction(user_id, data)
+
+        return conditional_response(Response(data), etag)
@@ -1,6 +1,45 @@
+from django import forms
 from django.contrib import admin
+from django.core.exceptions import ValidationError
 
+from transaction.services import adjust_balance, ledger_balance
 from users.models import CustomUser
 
-# Register your models here.
-admin.site.register(CustomUser)
\ No newline at end of file
+
+class CustomUserAdminForm(forms.ModelForm):
+    balance_adjustment = forms.DecimalField(
+        label="Ajuste de saldo",
+        required=False,
+        max_digits=12,
+        decimal_places=2,
+        help_text="Crédito (positivo) ou débito (negativo) lançado no razão ao salvar.",
+    )
+
+    class Meta:
+        model = CustomUser
+        fields = '__all__'
+
+    def clean_balance_adjustment(self):
+        adjustment = self.cleaned_data.get('balance_adjustment')
+        if adjustment and self.instance.pk is not None and ledger_balance(self.instance.pk) + adjustment < 0:
+            raise ValidationError("Saldo insuficiente para este ajuste.")
+        return adjustment
+
+
+@admin.register(CustomUser)
+class CustomUserAdmin(admin.ModelAdmin):
+    """
+    O saldo é só leitura: vem do razão, e qualquer ajuste vira um lançamento.
+    """
+
+    form = CustomUserAdminForm
+    readonly_fields = ('current_balance',)
+
+    @admin.display(description="Saldo atual")
+    def current_balance(self, obj):
+        return ledger_balance(obj.pk) if obj.pk else None
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if form.cleaned_data.get('balance_adjustment'):
+            adjust_balance(obj.pk, form.cleaned_data['balance_adjustment'])
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from users import async_views
+
+urlpatterns = [
+    path('register/', async_views.register, name='async-register'),
+    path('verify-email/', async_views.verify_email, name='async-verify-email'),
+    path('resend-verification/', async_views.resend_verification, name='async-resend-verification'),
+    path('login/', async_views.login, name='async-login'),
+    path('logout/', async_views.logout, name='async-logout'),
+    path('refresh/', async_views.refresh, name='async-refresh'),
+]
@@ -0,0 +1,160 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from api_uruita.async_utils import read_json
+
+from .hashing import ahash_password
+from .serializers import LoginSerializer, ResendVerificationSerializer, UserRegisterSerializer, VerifyEmailSerializer
+from .services import (
+    VerificationResult,
+    aauthenticate_cpf,
+    averify_email_code,
+    register_user,
+    resend_verification_code,
+)
+from .throttling import athrottle
+from .tokens import CachedRefreshToken
+
+User = get_user_model()
+
+
+def _invalid_json():
+    return JsonResponse({"detail": "JSON inválido."}, status=400)
+
+
+@csrf_exempt
+@require_POST
+async def register(request):
+    """
+    Versão assíncrona de RegisterView. O e-mail de verificação vai para o outbox.
+    """
+
+    data = read_json(request)
+    if data is None:
+        return _invalid_json()
+
+    serializer = UserRegisterSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    validated = serializer.validated_data
+    password_hash = await ahash_password(validated['password'])
+    user = await sync_to_async(register_user)(
+        validated['cpf'], validated['username'], validated['email'], password_hash
+    )
+    return JsonResponse(UserRegisterSerializer(user).data, status=201)
+
+
+@csrf_exempt
+@require_POST
+async def verify_email(request):
+    """
+    Versão assíncrona de VerifyEmailView.
+    """
+
+    data = read_json(request)
+    if data is None:
+        return _invalid_json()
+    if throttled := await athrottle(request, 'verify_email', data):
+        return throttled
+
+    serializer = VerifyEmailSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    result = await averify_email_code(serializer.validated_data['email'], serializer.validated_data['code'])
+    if result == VerificationResult.NOT_FOUND:
+        return JsonResponse({'error': 'Usuário não encontrado!'}, status=404)
+    if result == VerificationResult.INVALID:
+        return JsonResponse({'error': 'Código inválido!'}, status=400)
+    return JsonResponse({'message': 'Email verificado com sucesso!'})
+
+
+@csrf_exempt
+@require_POST
+async def resend_verification(request):
+    """
+    Versão assíncrona de ResendVerificationView.
+    """
+
+    data = read_json(request)
+    if data is None:
+        return _invalid_json()
+    if throttled := await athrottle(request, 'resend_verification', data):
+        return throttled
+
+    serializer = ResendVerificationSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    if not await sync_to_async(resend_verification_code)(serializer.validated_data['email']):
+        return JsonResponse({'error': 'Usuário não encontrado!'}, status=404)
+    return JsonResponse({'message': 'Novo código enviado!'})
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    """
+    Versão assíncrona de LoginView; o hash da senha roda no pool de processos.
+    """
+
+    data = read_json(request)
+    if data is None:
+        return _invalid_json()
+    if throttled := await athrottle(request, 'login', data):
+        return throttled
+
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    user = await aauthenticate_cpf(serializer.validated_data['cpf'], serializer.validated_data['password'])
+    if user is None:
+        return JsonResponse({'error': 'Credenciais inválidas!'}, status=401)
+    if not user.is_verified_email:
+        return JsonResponse({'error': 'Email não verificado!'}, status=403)
+
+    refresh = await sync_to_async(CachedRefreshToken.for_user)(user)
+    return JsonResponse({
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    })
+
+
+@csrf_exempt
+@require_POST
+async def refresh(request):
+    """
+    Versão assíncrona de CustomTokenRefreshView.
+    """
+
+    data = read_json(request)
+    refresh_token = data.get("refresh") if data else None
+    if not refresh_token:
+        return JsonResponse({"error": "Refresh token é obrigatório"}, status=400)
+
+    try:
+        token = await sync_to_async(CachedRefreshToken)(refresh_token)
+    except Exception:
+        return JsonResponse({"error": "Token inválido ou expirado"}, status=401)
+    return JsonResponse({"access": str(token.access_token)})
+
+
+@csrf_exempt
+@require_POST
+async def logout(request):
+    """
+    Versão assíncrona de LogoutView.
+    """
+
+    data = read_json(request)
+    try:
+        token = await sync_to_async(CachedRefreshToken)(data['refresh'])
+        await sync_to_async(token.blacklist)()
+    except Exception:
+        return JsonResponse({'error': 'Token inválido!'}, status=400)
+    return JsonResponse({'message': 'Logout realizado com sucesso!'}, status=205)
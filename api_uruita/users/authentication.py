@@ -0,0 +1,153 @@
+import functools
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+# Versão do formato do principal em cache; mude ao alterar PRINCIPAL_FIELDS.
+PRINCIPAL_VERSION = 1
+PRINCIPAL_FIELDS = ('id', 'cpf', 'is_active', 'is_verified_email', 'is_staff')
+
+
+def principal_cache_key(user_id):
+    return f"users:principal:v{PRINCIPAL_VERSION}:{user_id}"
+
+
+def invalidate_principal(user_id):
+    cache.delete(principal_cache_key(user_id))
+
+
+class UserPrincipal:
+    """
+    Representação enxuta do usuário autenticado via JWT, guardada em cache.
+    Não carrega o saldo: o fluxo de transferência sempre lê o saldo do banco.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, cpf, is_active, is_verified_email, is_staff):
+        self.id = id
+        self.cpf = cpf
+        self.is_active = is_active
+        self.is_verified_email = is_verified_email
+        self.is_staff = is_staff
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.cpf
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Autenticação JWT que resolve o usuário a partir de um principal em cache,
+    evitando uma leitura da tabela de usuários a cada requisição.
+    """
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _principal(self, data):
+        if data is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        principal = UserPrincipal(*data)
+        if not principal.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return principal
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+
+        key = principal_cache_key(user_id)
+        data = cache.get(key)
+        if data is None:
+            data = User.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*PRINCIPAL_FIELDS).first()
+            if data is not None:
+                cache.set(key, data, settings.JWT_PRINCIPAL_CACHE_SECONDS)
+
+        return self._principal(data)
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+
+        key = principal_cache_key(user_id)
+        data = await cache.aget(key)
+        if data is None:
+            data = await User.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*PRINCIPAL_FIELDS).afirst()
+            if data is not None:
+                await cache.aset(key, data, settings.JWT_PRINCIPAL_CACHE_SECONDS)
+
+        return self._principal(data)
+
+    async def aauthenticate(self, request):
+        """
+        Versão assíncrona de authenticate, para views async do Django.
+        """
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+
+def _unauthorized(authentication, request, detail):
+    # Mesmo corpo e WWW-Authenticate do 401 que o DRF gera para as views síncronas.
+    response = JsonResponse(detail, status=401)
+    response['WWW-Authenticate'] = authentication.authenticate_header(request)
+    return response
+
+
+def ajwt_required(view):
+    """
+    Decorator para views async: autentica pelo Bearer token e coloca o
+    principal em request.user, respondendo 401 quando não há credenciais válidas.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authentication = CachedJWTAuthentication()
+        try:
+            result = await authentication.aauthenticate(request)
+        except (AuthenticationFailed, InvalidToken) as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return _unauthorized(authentication, request, detail)
+
+        if result is None:
+            return _unauthorized(authentication, request, {"detail": NotAuthenticated.default_detail})
+
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
@@ -0,0 +1,111 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from api_uruita import metrics
+from api_uruita.lru import LRUCache
+
+# CPF normalizado (só dígitos) -> (id, is_active). Só guarda usuários que
+# existem: um CPF desconhecido sempre vai ao banco, então um cadastro novo
+# nunca esbarra em uma entrada negativa obsoleta.
+_users = LRUCache(maxsize=settings.CPF_LOOKUP_CACHE_SIZE, ttl=settings.CPF_LOOKUP_LOCAL_SECONDS)
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def normalize_cpf(value):
+    digits = ''.join(char for char in value if char.isdigit()) if isinstance(value, str) else ''
+    return digits if len(digits) == 11 else None
+
+
+def format_cpf(digits):
+    return f'{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}'
+
+
+def _cache_key(digits):
+    return f"users:cpf:{digits}"
+
+
+def _shared():
+    alias = settings.CPF_LOOKUP_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def lookup_stats():
+    """
+    Acertos (LRU local ou cache compartilhado) e faltas (consulta ao banco) desde o início do processo.
+    """
+
+    with _stats_lock:
+        return dict(_stats)
+
+
+def remember_user(cpf, user_id, is_active):
+    digits = normalize_cpf(cpf)
+    if digits is None:
+        return
+
+    _users.set(digits, (user_id, is_active))
+    shared = _shared()
+    if shared is not None:
+        shared.set(_cache_key(digits), (user_id, is_active), settings.CPF_LOOKUP_SHARED_SECONDS)
+
+
+def forget_user(cpf):
+    digits = normalize_cpf(cpf)
+    if digits is None:
+        return
+
+    _users.delete(digits)
+    shared = _shared()
+    if shared is not None:
+        shared.delete(_cache_key(digits))
+
+
+def resolve_cpf(cpf):
+    """
+    Resolve um CPF (com ou sem pontuação) para (id, is_active), ou None se
+    não existe usuário. LRU local, depois o cache compartilhado
+    (CPF_LOOKUP_CACHE_ALIAS) e só então o banco, lendo apenas essas duas colunas.
+
+    Outros processos podem manter uma entrada antiga por até
+    CPF_LOOKUP_LOCAL_SECONDS; transfer_funds confere de novo no banco
+    que o destinatário existe.
+    """
+
+    from users.models import CustomUser
+
+    digits = normalize_cpf(cpf)
+    if digits is None:
+        return None
+
+    found = _users.get(digits)
+    if found is None:
+        shared = _shared()
+        if shared is not None:
+            found = shared.get(_cache_key(digits))
+            if found is not None:
+                _users.set(digits, found)
+
+    if found is not None:
+        _count('hits')
+        return found
+
+    _count('misses')
+    found = CustomUser.objects.filter(cpf=format_cpf(digits)).values_list('pk', 'is_active').first()
+    if found is not None:
+        remember_user(digits, *found)
+    return found
+
+
+metrics.register_counter(
+    'users_cpf_lookup_total',
+    "Resoluções de CPF do destinatário por resultado (hit no cache ou miss no banco).",
+    lambda: {(('result', 'hit'),): _stats['hits'], (('result', 'miss'),): _stats['misses']},
+)
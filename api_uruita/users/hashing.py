@@ -0,0 +1,109 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    django.setup()
+
+
+def get_pool():
+    """
+    Pool de processos compartilhado para hash de senha. Com
+    PASSWORD_HASHING_WORKERS = 0 (padrão) o hash roda na própria thread.
+    """
+    global _pool
+
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+    return _pool
+
+
+def _discard_pool(pool):
+    """
+    Descarta um pool quebrado (um processo filho morreu) para que a próxima
+    chamada a get_pool() crie outro, em vez de falhar até o worker reiniciar.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _verify(password, encoded):
+    """
+    Confere a senha e diz se o hash precisa ser refeito no hasher preferido.
+    Roda dentro do pool, fora do GIL do processo da requisição.
+    """
+
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, False
+
+    if not hasher.verify(password, encoded):
+        return False, False
+
+    preferred = get_hasher('default')
+    must_update = hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+    return True, must_update
+
+
+def _run(func, *args, retry=True):
+    pool = get_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        if not retry:
+            raise
+        return _run(func, *args, retry=False)
+
+
+async def _arun(func, *args, retry=True):
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        if not retry:
+            raise
+        return await _arun(func, *args, retry=False)
+
+
+def hash_password(password):
+    return _run(make_password, password)
+
+
+def verify_password(password, encoded):
+    return _run(_verify, password, encoded)
+
+
+async def ahash_password(password):
+    return await _arun(make_password, password)
+
+
+async def averify_password(password, encoded):
+    return await _arun(_verify, password, encoded)
@@ -0,0 +1,55 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.hashing import get_pool, verify_password
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede logins/s (verificação de senha) em um único worker com N threads de requisição: "
+        "hash na própria thread (antes) contra o pool de processos (depois)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Processos do pool medido (padrão: PASSWORD_HASHING_WORKERS, ou 2 se for 0).",
+        )
+
+    def _measure(self, verify, encoded, logins, threads):
+        with ThreadPoolExecutor(threads) as executor:
+            started = time.perf_counter()
+            results = list(executor.map(lambda _: verify('senha-do-benchmark', encoded), range(logins)))
+            elapsed = time.perf_counter() - started
+
+        assert all(results)
+        return round(logins / elapsed, 2)
+
+    def handle(self, *args, **options):
+        encoded = make_password('senha-do-benchmark')
+        logins, threads = options['logins'], options['threads']
+        workers = options['workers'] or settings.PASSWORD_HASHING_WORKERS or 2
+
+        with override_settings(PASSWORD_HASHING_WORKERS=workers):
+            # Aquece o pool para não medir o spawn dos processos.
+            list(get_pool().map(int, range(workers)))
+
+            report = {
+                'hasher': encoded.split('$', 1)[0],
+                'logins': logins,
+                'threads': threads,
+                'workers': workers,
+                'inline_logins_per_sec': self._measure(check_password, encoded, logins, threads),
+                'pool_logins_per_sec': self._measure(
+                    lambda raw, enc: verify_password(raw, enc)[0], encoded, logins, threads
+                ),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
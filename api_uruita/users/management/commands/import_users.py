@@ -0,0 +1,130 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction as db_transaction
+
+from users.services import queue_verification_emails, validate_cpfs
+
+User = get_user_model()
+
+
+def _init_worker():
+    django.setup()
+
+
+def _chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuários de um CSV (colunas cpf, username, email, password) em lotes, "
+        "validando CPFs em bloco, gerando hashes de senha em um pool de processos e "
+        "inserindo com bulk_create. Cada usuário importado recebe um código de verificação "
+        "e o e-mail correspondente no outbox, a menos que --verified seja usado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=None, help="Processos para o hash das senhas.")
+        parser.add_argument('--prehashed', action='store_true', help="A coluna password já contém hashes do Django.")
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--rejects', help="Arquivo CSV para as linhas recusadas.")
+        parser.add_argument(
+            '--verified', action='store_true',
+            help="Marca os e-mails importados como já verificados, sem gerar códigos nem e-mails.",
+        )
+
+    def handle(self, *args, **options):
+        existing_cpfs, existing_emails, existing_usernames = set(), set(), set()
+        for cpf, email, username in User.objects.values_list('cpf', 'email', 'username').iterator(chunk_size=10000):
+            existing_cpfs.add(cpf)
+            existing_emails.add(email.lower())
+            existing_usernames.add(username)
+
+        imported, rejected = 0, 0
+        rejects_file = open(options['rejects'], 'w', newline='') if options['rejects'] else None
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        if rejects:
+            rejects.writerow(['cpf', 'email', 'motivo'])
+        pool = None if options['prehashed'] else ProcessPoolExecutor(options['workers'], initializer=_init_worker)
+
+        try:
+            with open(options['csv_path'], newline='') as source:
+                reader = csv.DictReader(source, delimiter=options['delimiter'])
+                missing = {'cpf', 'username', 'email', 'password'} - set(reader.fieldnames or ())
+                if missing:
+                    raise CommandError(f"Colunas ausentes no CSV: {', '.join(sorted(missing))}")
+
+                for chunk in _chunks(reader, options['chunk_size']):
+                    accepted = []
+                    for row, cpf_ok in zip(chunk, validate_cpfs([row['cpf'] for row in chunk])):
+                        error = self._reject_reason(row, cpf_ok, existing_cpfs, existing_emails, existing_usernames)
+                        if error:
+                            rejected += 1
+                            if rejects:
+                                rejects.writerow([row['cpf'], row['email'], error])
+                            continue
+
+                        existing_cpfs.add(row['cpf'])
+                        existing_emails.add(row['email'].lower())
+                        existing_usernames.add(row['username'])
+                        accepted.append(row)
+
+                    passwords = [row['password'] for row in accepted]
+                    if pool is not None:
+                        passwords = pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 64))
+
+                    with db_transaction.atomic():
+                        User.objects.bulk_create(
+                            [
+                                User(
+                                    cpf=row['cpf'], username=row['username'], email=row['email'],
+                                    password=password, is_verified_email=options['verified'],
+                                )
+                                for row, password in zip(accepted, passwords)
+                            ],
+                            batch_size=1000,
+                        )
+                        if not options['verified'] and accepted:
+                            queue_verification_emails(
+                                User.objects.filter(cpf__in=[row['cpf'] for row in accepted]).only('id', 'email', 'username')
+                            )
+                    imported += len(accepted)
+                    self.stdout.write(f"{imported} importado(s), {rejected} recusado(s)...")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Importação concluída: {imported} importado(s), {rejected} recusado(s)."))
+
+    def _reject_reason(self, row, cpf_ok, cpfs, emails, usernames):
+        if not cpf_ok:
+            return "CPF inválido"
+        if row['cpf'] in cpfs:
+            return "CPF já cadastrado"
+        if not row['username'] or row['username'] in usernames:
+            return "username inválido ou já cadastrado"
+        if not row['password']:
+            return "senha vazia"
+        try:
+            validate_email(row['email'])
+        except ValidationError:
+            return "email inválido"
+        if row['email'].lower() in emails:
+            return "email já cadastrado"
+        return None
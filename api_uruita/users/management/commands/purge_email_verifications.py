@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.services import purge_expired_verifications
+
+
+class Command(BaseCommand):
+    help = "Remove os códigos de verificação de e-mail expirados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_verifications(batch_size=options['batch_size'])
+        self.stdout.write(f"{deleted} código(s) removido(s).")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.tokens import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Remove os refresh tokens expirados e suas entradas na blacklist."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_tokens(batch_size=options['batch_size'])
+        self.stdout.write(f"{deleted} registro(s) removido(s).")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from users.services import drain_email_outbox
+
+
+class Command(BaseCommand):
+    help = "Envia os e-mails pendentes do outbox usando uma conexão SMTP persistente."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help="Continua drenando o outbox em segundo plano.")
+        parser.add_argument('--interval', type=float, default=2, help="Espera quando o outbox está vazio (segundos).")
+
+    def handle(self, *args, **options):
+        connection = get_connection(fail_silently=False)
+
+        try:
+            while True:
+                sent, failed = drain_email_outbox(connection=connection, batch_size=options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f"{sent} enviado(s), {failed} falha(s).")
+
+                if not options['loop']:
+                    break
+                if not sent and not failed:
+                    time.sleep(options['interval'])
+        finally:
+            connection.close()
@@ -1,9 +1,8 @@
-
-import random
-import string
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
 from django.core.validators import  RegexValidator
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
 from users.services import validate_cpf
 
@@ -14,7 +13,9 @@ class CustomUser(AbstractUser):
     """
 
     email = models.EmailField(unique=True)
-    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Projeção do razão, atualizada pela compactação (transaction.services.compact_ledger).
+    # Não é editável: ajustes de saldo são lançamentos (adjust_balance).
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
     cpf = models.CharField(
         max_length=14, 
         unique=True,
@@ -28,7 +29,9 @@ class CustomUser(AbstractUser):
     ) 
     phone_numbe = models.CharField(max_length=15, blank=True, null=True)
     is_verified_email = models.BooleanField(default=False) 
-    verification_code = models.CharField(max_length=4, blank=True, null=True)
+    # Contas com muitos recebimentos (ex.: lojistas) espalham os créditos em K
+    # shards de saldo e de agregado do extrato: o crédito não trava esta linha.
+    credit_shards = models.PositiveSmallIntegerField(default=1)
 
     groups = models.ManyToManyField(Group, related_name="customuser_groups", blank=True)
     user_permissions = models.ManyToManyField(Permission, related_name="customuser_permissions", blank=True)
@@ -36,13 +39,58 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'cpf' 
     REQUIRED_FIELDS = ['username','email']
 
-    def generate_verification_code(self):
-        """
-        Gera um código de verificação aleatório
-        """
+    def __str__(self):
+        return self.cpf 
+
+
+class EmailVerification(models.Model):
+    """
+    Código de verificação de e-mail emitido no cadastro. Expira em
+    EMAIL_VERIFICATION_TTL e aceita até EMAIL_VERIFICATION_MAX_ATTEMPTS
+    tentativas; os expirados são removidos pelo comando purge_email_verifications.
+    """
 
-        self.verification_code = ''.join(random.choices(string.digits, k=4))
-        self.save()
+    email = models.EmailField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="email_verifications")
+    code = models.CharField(max_length=4)
+    expires_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["email", "expires_at"], name="verification_email_exp_idx"),
+        ]
 
     def __str__(self):
-        return self.cpf 
+        return f"{self.email} | {self.expires_at}"
+
+
+class EmailOutbox(models.Model):
+    """
+    E-mail aguardando envio. Gravado na mesma transação do cadastro e
+    enviado depois pelo worker (comando send_outbox_emails).
+    """
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING", _("Pendente")
+        SENT = "SENT", _("Enviado")
+        FAILED = "FAILED", _("Falhou")
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=StatusChoices.choices, default=StatusChoices.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_status_next_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.to} | {self.subject} | {self.status}"
@@ -1,11 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
-from users.services import send_verification_email
+from api_uruita.metrics import TimedSerializerMixin
+
+from users.hashing import hash_password
+from users.services import register_user
 
 User = get_user_model()
 
-class UserRegisterSerializer(serializers.ModelSerializer):
+class UserRegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(write_only=True, min_length=6)
     password = serializers.CharField(write_only=True, min_length=6)
     
@@ -14,22 +17,21 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         fields = ['cpf','username', 'email', 'password']
 
     def create(self, validated_data):
-        user = User.objects.create_user(
+        # Hash calculado no pool de processos, antes de abrir a transação.
+        return register_user(
             cpf=validated_data['cpf'],
             username=validated_data['username'],
             email=validated_data['email'],
-            password=validated_data['password'],
+            password_hash=hash_password(validated_data['password']),
         )
-        user.generate_verification_code()
-
-        send_verification_email(user)
-
-        return user
 
 class VerifyEmailSerializer(serializers.Serializer):
     email = serializers.EmailField()
     code = serializers.CharField(max_length=4)
 
+class ResendVerificationSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+
 class LoginSerializer(serializers.Serializer):
     cpf = serializers.CharField() 
     password = serializers.CharField(write_only=True)
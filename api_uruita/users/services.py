@@ -1,9 +1,19 @@
+import re
+import secrets
+from datetime import timedelta
+from operator import getitem
+
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction as db_transaction
+from django.db.models import Exists, F, OuterRef
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 from django.conf import settings
 
+from api_uruita.purging import delete_in_batches
+
 def validate_cpf(value):
     """
     Valida um CPF com base no formato e nos dígitos verificadores.
@@ -34,23 +44,357 @@ def validate_cpf(value):
         raise ValidationError("CPF inválido")
 
 
+# Tabelas de pesos pré-calculadas, indexadas pelo byte ASCII do dígito:
+# _PESOS_DV1[i][ord(d)] == int(d) * (10 - i), _PESOS_DV2[i][ord(d)] == int(d) * (11 - i).
+_PESOS_DV1 = tuple(
+    tuple((byte - 48) * (10 - i) if 48 <= byte <= 57 else 0 for byte in range(256)) for i in range(9)
+)
+_PESOS_DV2 = tuple(
+    tuple((byte - 48) * (11 - i) if 48 <= byte <= 57 else 0 for byte in range(256)) for i in range(10)
+)
+_CPF_FORMATADO = re.compile(rb'\d{3}\.\d{3}\.\d{3}-\d{2}')
 
-def send_verification_email(user):
+
+def validate_cpfs(values):
     """
-    Envia um e-mail de verificação com um código de ativação para o usuário.
+    Valida uma lista de CPFs formatados (XXX.XXX.XXX-XX) de uma vez.
+    Retorna uma lista de booleanos na mesma ordem da entrada.
+
+    Mesma regra de validate_cpf, mas com os somatórios feitos por consulta às
+    tabelas de pesos em laços de C (map/sum), sem regex por dígito nem int().
     """
-    
+    results = []
+    for value in values:
+        raw = value.encode('ascii', 'replace')
+        if _CPF_FORMATADO.fullmatch(raw) is None:
+            results.append(False)
+            continue
+
+        digitos = raw.translate(None, b'.-')
+        if digitos == digitos[:1] * 11:
+            results.append(False)
+            continue
+
+        dv1 = sum(map(getitem, _PESOS_DV1, digitos)) * 10 % 11 % 10
+        dv2 = sum(map(getitem, _PESOS_DV2, digitos)) * 10 % 11 % 10
+        results.append(digitos[9] - 48 == dv1 and digitos[10] - 48 == dv2)
+
+    return results
+
+
+
+def register_user(cpf, username, email, password_hash):
+    """
+    Cria o usuário, o código de verificação e o e-mail no outbox em uma única transação,
+    com um INSERT por tabela. O hash da senha já deve vir pronto (ver users.hashing).
+    """
+    from users.models import CustomUser, EmailVerification
+
+    with db_transaction.atomic():
+        user = CustomUser(
+            cpf=cpf,
+            username=CustomUser.normalize_username(username),
+            email=CustomUser.objects.normalize_email(email),
+            password=password_hash,
+        )
+        user.save()
+        verification = EmailVerification.objects.create(
+            email=user.email,
+            user=user,
+            code=_verification_code(),
+            expires_at=timezone.now() + settings.EMAIL_VERIFICATION_TTL,
+        )
+
+        queue_verification_email(user, verification.code)
+
+    return user
+
+
+def _verification_code():
+    return ''.join(secrets.choice('0123456789') for _ in range(4))
+
+
+def _verification_email(user, code):
+    from users.models import EmailOutbox
+
     subject = "Confirmação de Cadastro"
-    context = {"username": user.username, "verification_code": user.verification_code}
-    
+    context = {"username": user.username, "verification_code": code}
+
     html_message = render_to_string("emails/verificar_email.html", context)
     plain_message = strip_tags(html_message)
-    
-    send_mail(
-        subject,
-        plain_message,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        html_message=html_message,
-        fail_silently=False,
-    )
\ No newline at end of file
+
+    return EmailOutbox(
+        to=user.email,
+        subject=subject,
+        body=plain_message,
+        html_body=html_message,
+    )
+
+
+def queue_verification_email(user, code):
+    """
+    Coloca na fila (outbox) o e-mail de verificação com o código de ativação do usuário.
+    Deve ser chamada dentro da transação do cadastro.
+    """
+    email = _verification_email(user, code)
+    email.save()
+    return email
+
+
+def queue_verification_emails(users, batch_size=1000):
+    """
+    Versão em lote do cadastro: cria um código de verificação e um e-mail no
+    outbox para cada usuário, com bulk_create. Usada pela importação de usuários.
+    """
+    from users.models import EmailOutbox, EmailVerification
+
+    expires_at = timezone.now() + settings.EMAIL_VERIFICATION_TTL
+    verifications = [
+        EmailVerification(email=user.email, user=user, code=_verification_code(), expires_at=expires_at)
+        for user in users
+    ]
+
+    with db_transaction.atomic():
+        EmailVerification.objects.bulk_create(verifications, batch_size=batch_size)
+        EmailOutbox.objects.bulk_create(
+            [_verification_email(v.user, v.code) for v in verifications],
+            batch_size=batch_size,
+        )
+
+    return len(verifications)
+
+
+def resend_verification_code(email):
+    """
+    Gera um novo código para um e-mail ainda não verificado, com tentativas e
+    validade zeradas, e coloca o e-mail no outbox; os códigos anteriores deixam
+    de valer. Retorna False se não há usuário não verificado com esse e-mail.
+    """
+    from users.models import CustomUser, EmailVerification
+
+    email = CustomUser.objects.normalize_email(email)
+    with db_transaction.atomic():
+        user = CustomUser.objects.select_for_update().filter(
+            email=email, is_verified_email=False
+        ).only('id', 'email', 'username').first()
+        if user is None:
+            return False
+
+        EmailVerification.objects.filter(user=user).delete()
+        verification = EmailVerification.objects.create(
+            email=user.email,
+            user=user,
+            code=_verification_code(),
+            expires_at=timezone.now() + settings.EMAIL_VERIFICATION_TTL,
+        )
+        queue_verification_email(user, verification.code)
+
+    return True
+
+
+class VerificationResult:
+    VERIFIED = 'verified'
+    INVALID = 'invalid'
+    NOT_FOUND = 'not_found'
+
+
+def _verification_filter(email, now):
+    from users.models import EmailVerification
+
+    return EmailVerification.objects.filter(
+        email=email,
+        expires_at__gt=now,
+        attempts__lt=settings.EMAIL_VERIFICATION_MAX_ATTEMPTS,
+    )
+
+
+def _verify_update(email, code):
+    """
+    Um único UPDATE condicional: marca o e-mail como verificado só se existir um
+    código igual, dentro da validade e abaixo do limite de tentativas.
+    """
+    from users.models import CustomUser
+
+    valid = _verification_filter(email, timezone.now()).filter(user_id=OuterRef('pk'), code=code)
+    return CustomUser.objects.filter(email=email, is_verified_email=False).filter(Exists(valid))
+
+
+def _verify_result(verified, user_id):
+    from users.authentication import invalidate_principal
+
+    if verified:
+        # update() não dispara post_save: o principal em cache sai na mão.
+        invalidate_principal(user_id)
+        return VerificationResult.VERIFIED
+    return VerificationResult.NOT_FOUND if user_id is None else VerificationResult.INVALID
+
+
+def verify_email_code(email, code):
+    """
+    Confere o código de verificação com uma única escrita: o UPDATE condicional
+    no acerto, ou o incremento de tentativas no erro.
+    """
+    from users.models import CustomUser
+
+    email = CustomUser.objects.normalize_email(email)
+    user_id = CustomUser.objects.filter(email=email).values_list('pk', flat=True).first()
+    if user_id is None:
+        return VerificationResult.NOT_FOUND
+
+    verified = _verify_update(email, code).update(is_verified_email=True)
+    if not verified:
+        _verification_filter(email, timezone.now()).update(attempts=F('attempts') + 1)
+    return _verify_result(verified, user_id)
+
+
+async def averify_email_code(email, code):
+    """
+    Versão assíncrona de verify_email_code.
+    """
+    from users.models import CustomUser
+
+    email = CustomUser.objects.normalize_email(email)
+    user_id = await CustomUser.objects.filter(email=email).values_list('pk', flat=True).afirst()
+    if user_id is None:
+        return VerificationResult.NOT_FOUND
+
+    verified = await _verify_update(email, code).aupdate(is_verified_email=True)
+    if not verified:
+        await _verification_filter(email, timezone.now()).aupdate(attempts=F('attempts') + 1)
+    return _verify_result(verified, user_id)
+
+
+def purge_expired_verifications(batch_size=1000):
+    """
+    Remove em lotes os códigos de verificação expirados.
+    """
+    from users.models import EmailVerification
+
+    return delete_in_batches(EmailVerification.objects.filter(expires_at__lte=timezone.now()), batch_size)
+
+
+def _claim_outbox_batch(batch_size, lease):
+    """
+    Reserva um lote de e-mails pendentes, adiando next_attempt_at pelo tempo do
+    lease. Se o worker cair no meio do envio, o lote volta para a fila sozinho.
+    """
+    from users.models import EmailOutbox
+
+    now = timezone.now()
+    with db_transaction.atomic():
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+                status=EmailOutbox.StatusChoices.PENDING,
+                next_attempt_at__lte=now,
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        EmailOutbox.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=now + lease)
+
+    return batch
+
+
+def drain_email_outbox(connection=None, batch_size=50):
+    """
+    Envia um lote do outbox por uma única conexão SMTP, com retentativas e
+    backoff exponencial. Retorna (enviados, falhas).
+    """
+    from users.models import EmailOutbox
+
+    batch = _claim_outbox_batch(batch_size, lease=timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS))
+    if not batch:
+        return 0, 0
+
+    own_connection = connection is None
+    if own_connection:
+        connection = get_connection(fail_silently=False)
+
+    sent, failed = 0, 0
+    connection.open()
+    try:
+        for email in batch:
+            message = EmailMultiAlternatives(
+                email.subject,
+                email.body,
+                settings.DEFAULT_FROM_EMAIL,
+                [email.to],
+                connection=connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, "text/html")
+
+            try:
+                message.send()
+            except Exception as e:
+                email.attempts += 1
+                email.last_error = str(e)
+                if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    email.status = EmailOutbox.StatusChoices.FAILED
+                backoff = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+                email.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+                email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+                failed += 1
+                # A conexão pode ter caído: reabre uma vez e segue com ela no resto do lote.
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception:
+                    # Servidor fora do ar: o resto do lote volta para a fila quando o lease expirar.
+                    break
+                continue
+
+            email.status = EmailOutbox.StatusChoices.SENT
+            email.sent_at = timezone.now()
+            email.save(update_fields=["status", "sent_at"])
+            sent += 1
+    finally:
+        if own_connection:
+            connection.close()
+
+    return sent, failed
+
+
+
+def authenticate_cpf(cpf, password):
+    """
+    Autentica por CPF e senha, com o hash rodando no pool de processos.
+    Refaz o hash quando a senha está em um tier de hasher desatualizado.
+    """
+    from users.hashing import hash_password, verify_password
+    from users.models import CustomUser
+
+    user = CustomUser.objects.filter(cpf=cpf).first()
+    if user is None:
+        # Mesmo custo de um login válido, para não revelar quais CPFs existem.
+        hash_password(password)
+        return None
+
+    verified, must_update = verify_password(password, user.password)
+    if not verified or not user.is_active:
+        return None
+
+    if must_update:
+        user.password = hash_password(password)
+        CustomUser.objects.filter(pk=user.pk).update(password=user.password)
+    return user
+
+
+async def aauthenticate_cpf(cpf, password):
+    """
+    Versão assíncrona de authenticate_cpf.
+    """
+    from users.hashing import ahash_password, averify_password
+    from users.models import CustomUser
+
+    user = await CustomUser.objects.filter(cpf=cpf).afirst()
+    if user is None:
+        await ahash_password(password)
+        return None
+
+    verified, must_update = await averify_password(password, user.password)
+    if not verified or not user.is_active:
+        return None
+
+    if must_update:
+        user.password = await ahash_password(password)
+        await CustomUser.objects.filter(pk=user.pk).aupdate(password=user.password)
+    return user
@@ -0,0 +1,38 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import invalidate_principal
+from users.cache import forget_user, remember_user
+from users.models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """
+    Descarta o principal em cache sempre que o usuário muda ou é removido.
+    """
+
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def cache_cpf_on_save(sender, instance, created, **kwargs):
+    """
+    Cadastro novo entra no cache de CPFs após o commit; qualquer outra
+    alteração (ex.: desativação) descarta a entrada.
+    """
+
+    cpf = instance.cpf
+    if created:
+        user_id, is_active = instance.pk, instance.is_active
+        db_transaction.on_commit(lambda: remember_user(cpf, user_id, is_active))
+    else:
+        db_transaction.on_commit(lambda: forget_user(cpf))
+
+
+@receiver(post_delete, sender=CustomUser)
+def forget_cpf_on_delete(sender, instance, **kwargs):
+    cpf = instance.cpf
+    db_transaction.on_commit(lambda: forget_user(cpf))
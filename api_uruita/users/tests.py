@@ -1,3 +1,434 @@
-from django.test import TestCase
+import csv
+import os
+import random
+import re
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from smtplib import SMTPServerDisconnected
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from api_uruita import ratelimit
+from transaction.services import adjust_balance, compact_ledger, ledger_balance, transfer_funds
+from users.admin import CustomUserAdminForm
+from users.models import CustomUser, EmailOutbox, EmailVerification
+from users.services import drain_email_outbox, queue_verification_email, validate_cpf, validate_cpfs
+from users.tokens import CachedRefreshToken, is_revoked, purge_expired_tokens
+
+
+class BalanceAdjustmentTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='cliente', email='a@a.com', password='x', balance=Decimal('100')
+        )
+        self.other = CustomUser.objects.create_user(cpf='111.444.777-35', username='outro', email='b@b.com', password='x')
+
+    def test_balance_is_not_editable_in_the_admin(self):
+        self.assertNotIn('balance', CustomUserAdminForm.base_fields)
+        self.assertIn('balance_adjustment', CustomUserAdminForm.base_fields)
+
+    def test_adjustment_is_a_ledger_entry(self):
+        transfer_funds(self.user.pk, self.other.pk, Decimal('10.00'))
+        compact_ledger()
+
+        self.assertEqual(adjust_balance(self.user.pk, Decimal('910.00')), Decimal('1000.00'))
+        self.assertEqual(ledger_balance(self.user.pk), Decimal('1000.00'))
+
+        compact_ledger()
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).balance, Decimal('1000.00'))
+
+    def test_adjustment_cannot_overdraw(self):
+        with self.assertRaises(ValidationError):
+            adjust_balance(self.user.pk, Decimal('-100.01'))
+        self.assertEqual(adjust_balance(self.user.pk, Decimal('-100.00')), Decimal('0.00'))
+
+
+@override_settings(RATELIMIT_RATES={})
+class ResendVerificationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        response = self.client.post('/api/v1/user/register/', {
+            'cpf': '529.982.247-25', 'username': 'cliente', 'email': 'cliente@a.com', 'password': 'segredo',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.user = CustomUser.objects.get(email='cliente@a.com')
+
+    def _verify(self, code):
+        return self.client.post('/api/v1/user/verify-email/', {'email': 'cliente@a.com', 'code': code}, format='json')
+
+    def test_new_code_after_exhausting_attempts(self):
+        code = self.user.email_verifications.get().code
+        wrong = '0000' if code != '0000' else '1111'
+        for _ in range(settings.EMAIL_VERIFICATION_MAX_ATTEMPTS):
+            self.assertEqual(self._verify(wrong).status_code, 400)
+        self.assertEqual(self._verify(code).status_code, 400)
+
+        response = self.client.post('/api/v1/user/resend-verification/', {'email': 'cliente@a.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        verification = self.user.email_verifications.get()
+        self.assertEqual(verification.attempts, 0)
+        self.assertEqual(EmailOutbox.objects.filter(to='cliente@a.com').count(), 2)
+
+        self.assertEqual(self._verify(verification.code).status_code, 200)
+        response = self.client.post('/api/v1/user/login/', {'cpf': '529.982.247-25', 'password': 'segredo'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_verified_or_unknown_email(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_verified_email=True)
+        for email in ('cliente@a.com', 'ninguem@a.com'):
+            response = self.client.post('/api/v1/user/resend-verification/', {'email': email}, format='json')
+            self.assertEqual(response.status_code, 404)
+
+
+class TokenBlacklistCacheTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(cpf='529.982.247-25', username='cliente', email='a@a.com', password='x')
+        self.token = CachedRefreshToken.for_user(self.user)
+        self.jti, self.exp = self.token['jti'], self.token['exp']
+
+    def _revoke_elsewhere(self):
+        # Logout atendido por outro worker: só a tabela muda.
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.jti))
+
+    def test_process_local_cache_keeps_no_negative_answers(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertFalse(is_revoked(self.jti, self.exp))
+            self._revoke_elsewhere()
+            self.assertTrue(is_revoked(self.jti, self.exp))
+
+    def test_shared_cache_keeps_negative_answers_briefly(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=shared):
+                self.assertFalse(is_revoked(self.jti, self.exp))
+                self._revoke_elsewhere()
+                self.assertFalse(is_revoked(self.jti, self.exp))
+                self.token.blacklist()
+                self.assertTrue(is_revoked(self.jti, self.exp))
+
+    def test_purge_deletes_expired_tokens_in_batches(self):
+        self.token.blacklist()
+        CachedRefreshToken.for_user(self.user)
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        CachedRefreshToken.for_user(self.user)
+
+        # Dois tokens expirados e a entrada de blacklist de um deles, em cascata.
+        self.assertEqual(purge_expired_tokens(batch_size=1), 3)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class FlakyBackend(locmem.EmailBackend):
+    """
+    Backend em memória que falha nos primeiros envios e conta as aberturas de conexão.
+    """
+
+    def __init__(self, failures=1, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise SMTPServerDisconnected("conexão perdida")
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(cpf='529.982.247-25', username='cliente', email='a@a.com', password='x')
+
+    def test_drains_with_the_locmem_backend(self):
+        queue_verification_email(self.user, '1234')
+
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            self.assertEqual(drain_email_outbox(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['a@a.com'])
+        self.assertIn('1234', mail.outbox[0].body)
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.StatusChoices.SENT)
+        self.assertEqual(drain_email_outbox(), (0, 0))
+
+    def test_failure_backs_off_and_keeps_one_connection(self):
+        first = queue_verification_email(self.user, '1111')
+        queue_verification_email(self.user, '2222')
+        connection = FlakyBackend(failures=1)
+
+        before = timezone.now()
+        self.assertEqual(drain_email_outbox(connection=connection), (1, 1))
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (EmailOutbox.StatusChoices.PENDING, 1))
+        self.assertGreaterEqual(first.next_attempt_at, before + timedelta(seconds=settings.EMAIL_OUTBOX_BACKOFF_SECONDS))
+        self.assertIn('conexão perdida', first.last_error)
+        # Uma abertura no início do lote e uma única reabertura depois da falha.
+        self.assertEqual(connection.opened, 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # Ainda no backoff: não é reenviado.
+        self.assertEqual(drain_email_outbox(connection=connection), (0, 0))
+
+    def test_moves_to_failed_after_max_attempts(self):
+        email = queue_verification_email(self.user, '1234')
+        EmailOutbox.objects.filter(pk=email.pk).update(attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS - 1)
+
+        self.assertEqual(drain_email_outbox(connection=FlakyBackend(failures=1)), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (EmailOutbox.StatusChoices.FAILED, settings.EMAIL_OUTBOX_MAX_ATTEMPTS))
+        self.assertEqual(drain_email_outbox(connection=FlakyBackend(failures=0)), (0, 0))
+
+
+@override_settings(RATELIMIT_RATES={'login.ip': '3/min', 'login.cpf': '1/min', 'verify_email.ip': '1/min'})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        ratelimit._store = None
+        self.addCleanup(setattr, ratelimit, '_store', None)
+        self.client = APIClient()
+
+    def login(self, cpf):
+        return self.client.post('/api/v1/user/login/', {'cpf': cpf, 'password': 'errada'}, format='json')
+
+    def assertThrottled(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertIn('detail', response.json())
+
+    def test_throttled_login_skips_db_and_hashing(self):
+        self.assertEqual(self.login('529.982.247-25').status_code, 401)
+
+        with mock.patch('users.views.authenticate_cpf') as authenticate, CaptureQueriesContext(connection) as queries:
+            # Mesmo CPF com outra formatação cai no mesmo balde.
+            response = self.login('52998224725')
+
+        self.assertThrottled(response)
+        authenticate.assert_not_called()
+        self.assertEqual(len(queries), 0)
+
+    def test_ip_bucket_applies_across_cpfs(self):
+        for cpf in ('529.982.247-25', '111.444.777-35', '123.456.789-09'):
+            self.assertNotEqual(self.login(cpf).status_code, 429)
+
+        self.assertThrottled(self.login('987.654.321-00'))
+
+    def test_throttled_verify_email_skips_db(self):
+        data = {'email': 'a@a.com', 'code': '000000'}
+        self.assertEqual(self.client.post('/api/v1/user/verify-email/', data, format='json').status_code, 400)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/user/verify-email/', data, format='json')
+
+        self.assertThrottled(response)
+        self.assertEqual(len(queries), 0)
+
+
+def _valid_cpf(rng):
+    digits = [rng.randrange(10) for _ in range(9)]
+    for n in (10, 11):
+        digits.append(sum(d * (n - i) for i, d in enumerate(digits)) * 10 % 11 % 10)
+    cpf = ''.join(map(str, digits))
+    return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+
+
+def _mutate(rng, cpf):
+    i = rng.randrange(len(cpf))
+    return rng.choice([
+        lambda: cpf,
+        lambda: cpf[:i] + rng.choice('0123456789.-x ') + cpf[i + 1:],
+        lambda: cpf[:i] + cpf[i + 1:],
+        lambda: cpf[:i] + rng.choice('0123456789') + cpf[i:],
+        lambda: cpf[:i] + '\u0665' + cpf[i + 1:],
+        lambda: re.sub(r'\D', '', cpf),
+        lambda: cpf[0] * 3 + '.' + cpf[0] * 3 + '.' + cpf[0] * 3 + '-' + cpf[0] * 2,
+        lambda: cpf + '\n',
+    ])()
+
+
+class ValidateCPFsTests(TestCase):
+    def reference(self, value):
+        if re.fullmatch(r'\d{3}\.\d{3}\.\d{3}-\d{2}', value) is None:
+            return False
+        try:
+            validate_cpf(value)
+        except ValidationError:
+            return False
+        return True
+
+    def test_matches_validate_cpf_and_format(self):
+        rng = random.Random(0)
+        values = [_mutate(rng, _valid_cpf(rng)) for _ in range(5000)]
+
+        self.assertEqual(validate_cpfs(values), [self.reference(value) for value in values])
+        self.assertTrue(any(validate_cpfs(values)))
+        self.assertFalse(all(validate_cpfs(values)))
+
+
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        CustomUser.objects.create_user(cpf='529.982.247-25', username='existente', email='Existe@a.com', password='x')
+
+    def write_csv(self, rows, header=('cpf', 'username', 'email', 'password')):
+        path = os.path.join(self.dir.name, 'usuarios.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+
+    def import_users(self, rows, *args):
+        rejects = os.path.join(self.dir.name, 'recusados.csv')
+        call_command('import_users', self.write_csv(rows), '--prehashed', '--rejects', rejects, *args, stdout=open(os.devnull, 'w'))
+        with open(rejects, newline='') as f:
+            return {row['cpf']: row['motivo'] for row in csv.DictReader(f)}
+
+    def test_imports_and_writes_rejects(self):
+        password = make_password('senha')
+        rejects = self.import_users([
+            ('111.444.777-35', 'novo', 'novo@a.com', password),
+            ('111.444.777-36', 'invalido', 'invalido@a.com', password),
+            ('529.982.247-25', 'repetido', 'repetido@a.com', password),
+            ('111.444.777-35', 'duplicado', 'duplicado@a.com', password),
+            ('123.456.789-09', 'novo', 'outro@a.com', password),
+            ('987.654.321-00', 'email', 'EXISTE@A.COM', password),
+            ('390.533.447-05', 'semsenha', 'semsenha@a.com', ''),
+            ('862.883.460-55', 'emailruim', 'nao-e-email', password),
+        ])
+
+        self.assertEqual(rejects, {
+            '111.444.777-36': 'CPF inválido',
+            '529.982.247-25': 'CPF já cadastrado',
+            '111.444.777-35': 'CPF já cadastrado',
+            '123.456.789-09': 'username inválido ou já cadastrado',
+            '987.654.321-00': 'email já cadastrado',
+            '390.533.447-05': 'senha vazia',
+            '862.883.460-55': 'email inválido',
+        })
+        user = CustomUser.objects.get(cpf='111.444.777-35')
+        self.assertEqual(user.username, 'novo')
+        self.assertFalse(user.is_verified_email)
+        self.assertTrue(user.check_password('senha'))
+        self.assertEqual(EmailVerification.objects.filter(user=user).count(), 1)
+        self.assertEqual(EmailOutbox.objects.filter(to='novo@a.com').count(), 1)
+
+    def test_verified_skips_codes_and_emails(self):
+        self.import_users([('111.444.777-35', 'novo', 'novo@a.com', make_password('senha'))], '--verified')
+
+        self.assertTrue(CustomUser.objects.get(cpf='111.444.777-35').is_verified_email)
+        self.assertFalse(EmailVerification.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_rejects_csv_without_required_columns(self):
+        with self.assertRaisesMessage(CommandError, 'Colunas ausentes no CSV: password'):
+            call_command('import_users', self.write_csv([], header=('cpf', 'username', 'email')), '--prehashed')
+
+
+@override_settings(RATELIMIT_RATES={'login.cpf': '2/min'})
+class AsyncViewParityTests(TestCase):
+    """
+    As views async re-implementam as respostas das views DRF: cada caso roda nos
+    dois caminhos e compara status, corpo e headers relevantes.
+    """
+
+    def setUp(self):
+        ratelimit._store = None
+        self.addCleanup(setattr, ratelimit, '_store', None)
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            cpf='529.982.247-25', username='cliente', email='a@a.com', password='senha', is_verified_email=True,
+        )
+
+    def both(self, path, data, **extra):
+        responses = [
+            self.client.post(f'/api/v1/{prefix}user/{path}', data, format='json', **extra)
+            for prefix in ('', 'async/')
+        ]
+        self.assertEqual(*(response.status_code for response in responses))
+        return responses
+
+    def assertSame(self, path, data, status_code, **extra):
+        sync, async_ = self.both(path, data, **extra)
+        self.assertEqual(sync.status_code, status_code)
+        self.assertEqual(sync.json(), async_.json())
+        return sync
+
+    def test_register(self):
+        self.assertSame('register/', {'cpf': '123', 'username': 'x', 'email': 'x', 'password': 'x'}, 400)
+        self.assertSame('register/', {'cpf': '111.444.777-35', 'username': 'cliente', 'email': 'a@a.com', 'password': 'x'}, 400)
+
+        sync = self.client.post('/api/v1/user/register/', {
+            'cpf': '111.444.777-35', 'username': 'novousuario', 'email': 'novo@a.com', 'password': 'senha123',
+        }, format='json')
+        async_ = self.client.post('/api/v1/async/user/register/', {
+            'cpf': '123.456.789-09', 'username': 'outrousuario', 'email': 'outro@a.com', 'password': 'senha123',
+        }, format='json')
+        self.assertEqual((sync.status_code, async_.status_code), (201, 201))
+        self.assertEqual(sync.json().keys(), async_.json().keys())
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_malformed_json(self):
+        for path in ('/api/v1/user/login/', '/api/v1/async/user/login/'):
+            response = self.client.post(path, '{', content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('JSON', response.json()['detail'])
+
+    def test_verification(self):
+        CustomUser.objects.create_user(cpf='111.444.777-35', username='novo', email='novo@a.com', password='x')
+
+        self.assertSame('verify-email/', {'email': 'nada@a.com', 'code': '0000'}, 404)
+        self.assertSame('verify-email/', {'email': 'novo@a.com', 'code': '0000'}, 400)
+        self.assertSame('verify-email/', {'email': 'novo@a.com'}, 400)
+        self.assertSame('resend-verification/', {'email': 'nada@a.com'}, 404)
+        self.assertSame('resend-verification/', {'email': 'novo@a.com'}, 200)
+
+    def test_login(self):
+        CustomUser.objects.create_user(cpf='111.444.777-35', username='novo', email='novo@a.com', password='senha')
+
+        self.assertSame('login/', {'password': 'senha'}, 400)
+        self.assertSame('login/', {'cpf': '987.654.321-00', 'password': 'errada'}, 401)
+        self.assertSame('login/', {'cpf': '111.444.777-35', 'password': 'senha'}, 403)
+
+        sync, async_ = self.both('login/', {'cpf': '111.444.777-35', 'password': 'senha'})
+        self.assertEqual(sync.status_code, 429)
+        self.assertEqual(sync.json(), async_.json())
+        self.assertEqual(sync['Retry-After'], async_['Retry-After'])
+
+        sync, async_ = self.both('login/', {'cpf': '529.982.247-25', 'password': 'senha'})
+        self.assertEqual(sync.status_code, 200)
+        self.assertEqual(sync.json().keys(), async_.json().keys())
+
+    def test_tokens(self):
+        refresh = [str(CachedRefreshToken.for_user(self.user)) for _ in range(2)]
+
+        self.assertSame('refresh/', {}, 400)
+        self.assertSame('refresh/', {'refresh': 'x'}, 401)
+        sync, async_ = self.both('refresh/', {'refresh': refresh[0]})
+        self.assertEqual(sync.status_code, 200)
+        self.assertEqual(sync.json().keys(), async_.json().keys())
+
+        self.assertSame('logout/', {'refresh': 'x'}, 400)
+        for path, token in (('/api/v1/user/logout/', refresh[0]), ('/api/v1/async/user/logout/', refresh[1])):
+            response = self.client.post(path, {'refresh': token}, format='json')
+            self.assertEqual((response.status_code, response.json()), (205, {'message': 'Logout realizado com sucesso!'}))
+        self.assertSame('refresh/', {'refresh': refresh[0]}, 401)
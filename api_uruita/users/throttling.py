@@ -0,0 +1,82 @@
+import re
+
+from django.http import JsonResponse
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from api_uruita import ratelimit
+
+
+def _field(data, name):
+    if isinstance(data, dict):
+        value = data.get(name)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+def normalize_cpf(value):
+    return re.sub(r'\D', '', value) if value else None
+
+
+def normalize_email(value):
+    return value.strip().lower() if value else None
+
+
+# Tipo de chave -> normalização do campo de mesmo nome no corpo da requisição.
+# O tipo 'ip' não vem do corpo: usa get_ident().
+_FIELD_KINDS = {
+    'cpf': normalize_cpf,
+    'email': normalize_email,
+}
+
+
+def _field_value(kind, data):
+    return _FIELD_KINDS[kind](_field(data, kind))
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Throttle de balde de fichas (api_uruita.ratelimit) no escopo `throttle_scope`
+    da view. Roda em initial(), antes do handler: a requisição recusada não
+    chega a tocar banco nem hash de senha.
+    """
+
+    kind = 'ip'
+
+    def allow_request(self, request, view):
+        value = self.get_ident(request) if self.kind == 'ip' else _field_value(self.kind, request.data)
+        self.retry_after = ratelimit.hit(view.throttle_scope, self.kind, value)
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPThrottle(BucketThrottle):
+    kind = 'ip'
+
+
+class CPFThrottle(BucketThrottle):
+    kind = 'cpf'
+
+
+class EmailThrottle(BucketThrottle):
+    kind = 'email'
+
+
+async def athrottle(request, scope, data):
+    """
+    Mesma checagem dos throttles para as views async. Retorna a resposta 429
+    ou None se a requisição pode seguir.
+    """
+
+    keys = {'ip': BaseThrottle().get_ident(request), **{kind: _field_value(kind, data) for kind in _FIELD_KINDS}}
+    waits = [wait for kind, value in keys.items() if (wait := await ratelimit.ahit(scope, kind, value)) is not None]
+    if not waits:
+        return None
+
+    exc = Throttled(wait=max(waits))
+    response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    response['Retry-After'] = str(exc.wait)
+    return response
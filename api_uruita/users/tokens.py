@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api_uruita.caching import is_shared_cache
+from api_uruita.lru import LRUCache
+from api_uruita.purging import delete_in_batches
+
+# Só guarda tokens revogados: uma revogação nunca é desfeita, então não fica obsoleta.
+_revoked = LRUCache(maxsize=settings.TOKEN_BLACKLIST_LRU_SIZE)
+
+
+def _cache_key(jti):
+    return f"users:jwt-blacklist:{jti}"
+
+
+def _seconds_until(exp):
+    return max(int(exp - timezone.now().timestamp()), 1)
+
+
+def is_revoked(jti, exp):
+    """
+    Verifica se o token foi revogado: LRU local, depois o cache do Django e,
+    só em último caso, a tabela de blacklist. Respostas negativas ficam no
+    cache por pouco tempo, e só se ele for compartilhado: revogações o
+    sobrescrevem na hora, o que não chega ao cache local de outro worker.
+    """
+
+    if _revoked.get(jti):
+        return True
+
+    key = _cache_key(jti)
+    revoked = cache.get(key)
+    if revoked is None:
+        revoked = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if revoked:
+            cache.set(key, True, _seconds_until(exp))
+        elif is_shared_cache():
+            cache.set(key, False, settings.TOKEN_BLACKLIST_NEGATIVE_SECONDS)
+
+    if revoked:
+        _revoked.set(jti, True, ttl=_seconds_until(exp))
+    return revoked
+
+
+def purge_expired_tokens(batch_size=1000):
+    """
+    Remove em lotes os tokens expirados (e suas entradas de blacklist, em cascata).
+    """
+
+    return delete_in_batches(OutstandingToken.objects.filter(expires_at__lte=timezone.now()), batch_size)
+
+
+class CachedRefreshToken(RefreshToken):
+    """
+    Refresh token que consulta a blacklist pelo cache antes de ir ao banco.
+    """
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM], self.payload["exp"]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+
+        jti, exp = self.payload[api_settings.JTI_CLAIM], self.payload["exp"]
+        cache.set(_cache_key(jti), True, _seconds_until(exp))
+        _revoked.set(jti, True, ttl=_seconds_until(exp))
+        return result
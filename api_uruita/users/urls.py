@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import RegisterView, VerifyEmailView, LoginView, LogoutView,CustomTokenRefreshView
+from .views import RegisterView, VerifyEmailView, ResendVerificationView, LoginView, LogoutView,CustomTokenRefreshView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('verify-email/', VerifyEmailView.as_view(), name='verify-email'),
+    path('resend-verification/', ResendVerificationView.as_view(), name='resend-verification'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('refresh/', CustomTokenRefreshView.as_view(), name='refresh'),
@@ -1,11 +1,12 @@
-from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
 from rest_framework import status, generics
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
-from .serializers import UserRegisterSerializer, VerifyEmailSerializer, LoginSerializer
+from .serializers import UserRegisterSerializer, VerifyEmailSerializer, LoginSerializer, ResendVerificationSerializer
+from .services import VerificationResult, authenticate_cpf, resend_verification_code, verify_email_code
+from .throttling import CPFThrottle, EmailThrottle, IPThrottle
+from .tokens import CachedRefreshToken
 
 User = get_user_model()
 
@@ -21,23 +22,41 @@ class VerifyEmailView(APIView):
     View para validar o código de verificação
     """
 
+    # Sem autenticação e com throttle por IP e e-mail: tentativas de adivinhar
+    # o código são recusadas com 429 antes de qualquer acesso ao banco.
+    authentication_classes = []
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'verify_email'
+
     def post(self, request):
         serializer = VerifyEmailSerializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.validated_data['email']
-            code = serializer.validated_data['code']
-
-            try:
-                user = User.objects.get(email=email)
-                if user.verification_code == code:
-                    user.is_verified_email = True
-                    user.verification_code = None
-                    user.save()
-                    return Response({'message': 'Email verificado com sucesso!'}, status=status.HTTP_200_OK)
-                else:
-                    return Response({'error': 'Código inválido!'}, status=status.HTTP_400_BAD_REQUEST)
-            except User.DoesNotExist:
+            result = verify_email_code(serializer.validated_data['email'], serializer.validated_data['code'])
+
+            if result == VerificationResult.VERIFIED:
+                return Response({'message': 'Email verificado com sucesso!'}, status=status.HTTP_200_OK)
+            if result == VerificationResult.NOT_FOUND:
                 return Response({'error': 'Usuário não encontrado!'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'error': 'Código inválido!'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class ResendVerificationView(APIView):
+    """
+    View para gerar um novo código de verificação (o anterior expirou ou
+    esgotou as tentativas)
+    """
+
+    authentication_classes = []
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'resend_verification'
+
+    def post(self, request):
+        serializer = ResendVerificationSerializer(data=request.data)
+        if serializer.is_valid():
+            if resend_verification_code(serializer.validated_data['email']):
+                return Response({'message': 'Novo código enviado!'}, status=status.HTTP_200_OK)
+            return Response({'error': 'Usuário não encontrado!'}, status=status.HTTP_404_NOT_FOUND)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -55,7 +74,7 @@ class CustomTokenRefreshView(APIView):
             return Response({"error": "Refresh token é obrigatório"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            refresh = RefreshToken(refresh_token)
+            refresh = CachedRefreshToken(refresh_token)
             access_token = str(refresh.access_token) 
             return Response({"access": access_token}, status=status.HTTP_200_OK)
         except Exception as e: 
@@ -66,19 +85,25 @@ class LoginView(APIView):
     View para login de usuário
     """
 
+    # Throttle por IP e CPF antes do handler: o 429 sai sem consultar o banco
+    # nem calcular o hash da senha.
+    authentication_classes = []
+    throttle_classes = [IPThrottle, CPFThrottle]
+    throttle_scope = 'login'
+
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             cpf = serializer.validated_data['cpf']
             password = serializer.validated_data['password']
             
-            user = authenticate(request, cpf=cpf, password=password)
+            user = authenticate_cpf(cpf, password)
             
             if user:
                 if not user.is_verified_email:
                     return Response({'error': 'Email não verificado!'}, status=status.HTTP_403_FORBIDDEN)
 
-                refresh = RefreshToken.for_user(user)
+                refresh = CachedRefreshToken.for_user(user)
                 return Response({
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
@@ -95,7 +120,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data['refresh']
-            token = RefreshToken(refresh_token)
+            token = CachedRefreshToken(refresh_token)
             token.blacklist()
             return Response({'message': 'Logout realizado com sucesso!'}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e: